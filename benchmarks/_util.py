@@ -0,0 +1,62 @@
+"""Shared helpers for the benchmarks. These run the library against an
+in-memory socket so that they measure our own overhead, not the network.
+"""
+
+import asyncio
+import os
+import time
+
+fixture_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            '..', 'tests', 'fixture')
+
+
+def fixture(path, mode='r'):
+    with open(os.path.join(fixture_path, path), mode) as content_file:
+        contents = content_file.read()
+        if isinstance(contents, str):
+            contents = contents.strip()
+
+        return contents
+
+
+class MemorySocket:
+    """
+    MemorySocket is a stand-in for a websocket which reads frames from a
+    queue and records the frames written to it.
+    """
+
+    def __init__(self, loop):
+        self.received = asyncio.Queue(loop=loop)
+        self.sent = []
+        self.received.put_nowait('{"type":"method","method":"hello","seq":1}')
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def recv(self):
+        return await self.received.get()
+
+    async def close(self):
+        pass
+
+
+class Timer:
+    """
+    Timer is a context manager which measures the wall time spent in it::
+
+        with Timer() as t:
+            do_the_thing()
+        print(t.elapsed)
+    """
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self._start
+
+
+def report(name, elapsed, operations, unit='ops'):
+    print('{:<40} {:>10.2f} ms {:>14,.0f} {}/s'.format(
+        name, elapsed * 1000, operations / elapsed, unit))
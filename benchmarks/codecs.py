@@ -0,0 +1,69 @@
+"""
+Compares parsing and serializing packets with the json module through the
+OverridableJSONEncoder, as Connection used to, against the available
+codecs. Parsing runs over the decoded sample fixtures, starting from
+UTF-8 bytes as they come out of the GzipEncoding.
+
+Run this with::
+
+    python -m benchmarks.codecs [iterations]
+"""
+
+import json
+from sys import argv
+
+from interactive_python import Button, JSONCodec, OrjsonCodec
+from interactive_python._util import json_encoder
+from interactive_python.codec import orjson
+from ._util import Timer, fixture, report
+
+samples = 3
+
+
+class LegacyCodec:
+    def dumps(self, obj):
+        return json_encoder.encode(obj)
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
+
+
+def bench(name, codec, frames, packets, iterations):
+    with Timer() as t:
+        for i in range(iterations):
+            for frame in frames:
+                codec.loads(frame)
+    report(name + ' loads', t.elapsed, iterations * len(frames), 'frames')
+
+    with Timer() as t:
+        for i in range(iterations):
+            for packet in packets:
+                codec.dumps(packet)
+    report(name + ' dumps', t.elapsed, iterations * len(packets), 'packets')
+
+
+def main(iterations):
+    frames = [fixture('sample{}_decoded'.format(i)).encode('utf-8')
+              for i in range(samples)]
+    packets = [json.loads(frame.decode('utf-8')) for frame in frames]
+    packets.append({
+        'type': 'method',
+        'method': 'createControls',
+        'params': {
+            'sceneID': 'default',
+            'controls': [Button('button_{}'.format(i), text=str(i), cost=0)
+                         for i in range(20)],
+        },
+        'id': 0,
+        'seq': 0,
+    })
+
+    bench('json + OverridableJSONEncoder', LegacyCodec(), frames, packets,
+          iterations)
+    bench('JSONCodec', JSONCodec(), frames, packets, iterations)
+    if orjson is not None:
+        bench('OrjsonCodec', OrjsonCodec(), frames, packets, iterations)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 20000)
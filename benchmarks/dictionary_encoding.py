@@ -0,0 +1,47 @@
+"""
+Compares the compression ratio and speed of the PresetDictionaryEncoding
+against the GzipEncoding over the sample fixtures, both for the first
+frames on a fresh connection and for a long-running stream.
+
+Run this with::
+
+    python -m benchmarks.dictionary_encoding [iterations]
+"""
+
+from sys import argv
+
+from interactive_python import GzipEncoding, PresetDictionaryEncoding
+from ._util import Timer, fixture, report
+
+samples = 3
+
+
+def bench(name, cls, messages, iterations):
+    fresh = sum(len(cls().encode(m)) for m in messages)
+    raw = sum(len(m) for m in messages)
+    print('{:<40} first frame ratio {:.2f}'.format(name, raw / fresh))
+
+    encoder = cls()
+    with Timer() as t:
+        frames = [encoder.encode(m) for i in range(iterations)
+                  for m in messages]
+    report(name + ' encode', t.elapsed, len(frames), 'frames')
+    print('{:<40} stream ratio {:.2f}'.format(
+        name, raw * iterations / sum(len(f) for f in frames)))
+
+    decoder = cls()
+    with Timer() as t:
+        for frame in frames:
+            decoder.decode(frame)
+    report(name + ' decode', t.elapsed, len(frames), 'frames')
+
+
+def main(iterations):
+    messages = [fixture('sample{}_decoded'.format(i)) for i in range(samples)]
+    bench('GzipEncoding', GzipEncoding, messages, iterations)
+    bench('PresetDictionaryEncoding', PresetDictionaryEncoding, messages,
+          iterations)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 20000)
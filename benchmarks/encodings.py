@@ -0,0 +1,53 @@
+"""
+Compares the text, gzip and msgpack encodings on the sample fixtures. Each
+packet is serialized and encoded as it would be sent, then decoded and
+parsed as it would be received, using the connection's default codec for
+the JSON based schemes. The size on the wire is reported alongside.
+
+Run this with::
+
+    python -m benchmarks.encodings [iterations]
+"""
+
+import json
+from sys import argv
+
+from interactive_python import GzipEncoding, MessagePackEncoding, \
+    TextEncoding, default_codec
+from interactive_python.codec import msgpack
+from ._util import Timer, fixture, report
+
+samples = 3
+
+
+def bench(name, make_encoding, packets, iterations):
+    encoder = make_encoding()
+    codec = encoder.codec() or default_codec()
+    with Timer() as t:
+        frames = [encoder.encode(codec.dumps(p)) for i in range(iterations)
+                  for p in packets]
+    report(name + ' encode', t.elapsed, len(frames), 'frames')
+
+    decoder = make_encoding()
+    with Timer() as t:
+        for frame in frames:
+            codec.loads(decoder.decode_bytes(frame))
+    report(name + ' decode', t.elapsed, len(frames), 'frames')
+
+    size = sum(len(frame) for frame in frames[:len(packets)])
+    print('{:<40} {:>10,} bytes per round of samples'.format(
+        name + ' size', size))
+
+
+def main(iterations):
+    packets = [json.loads(fixture('sample{}_decoded'.format(i)))
+               for i in range(samples)]
+
+    bench('text', TextEncoding, packets, iterations)
+    bench('gzip', GzipEncoding, packets, iterations)
+    if msgpack is not None:
+        bench('msgpack', MessagePackEncoding, packets, iterations)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 20000)
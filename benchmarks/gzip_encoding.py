@@ -0,0 +1,95 @@
+"""
+Compares the throughput of the GzipEncoding against the GzipFile and BytesIO
+based implementation it replaced, encoding and decoding a stream of the
+sample fixtures. The old implementation needs the varint package.
+
+Run this with::
+
+    python -m benchmarks.gzip_encoding [iterations]
+"""
+
+from gzip import GzipFile
+import io
+import zlib
+from sys import argv
+
+from interactive_python import GzipEncoding
+from ._util import Timer, fixture, report
+
+try:
+    import varint
+except ImportError:
+    varint = None
+
+samples = 3
+
+
+def reset_buffer(buffer, value=None):
+    buffer.truncate(0)
+    buffer.seek(0)
+
+    if value is not None:
+        buffer.write(value)
+
+
+class LegacyGzipEncoding:
+    def __init__(self, compression_level=6):
+        self._encoder_buffer = io.BytesIO()
+        self._encoder = None
+        self._decoder_buffer = io.BytesIO()
+        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._compression_level = compression_level
+
+    def encode(self, data):
+        data = data.encode('utf-8')
+        self._encoder_buffer.write(varint.encode(len(data)))
+        if self._encoder is None:
+            self._encoder = GzipFile(fileobj=self._encoder_buffer, mode='wb',
+                                     compresslevel=self._compression_level)
+
+        self._encoder.write(data)
+        self._encoder.flush()
+
+        output = self._encoder_buffer.getvalue()
+        reset_buffer(self._encoder_buffer)
+
+        return output
+
+    def decode(self, data):
+        prefix_stream = io.BytesIO(data)
+        decoded_bytes = varint.decode_stream(prefix_stream)
+        self._decoder_buffer.write(data[prefix_stream.tell():])
+        self._decoder_buffer.seek(0)
+
+        decoded_data = self._decoder.decompress(
+            self._decoder_buffer.getbuffer(), decoded_bytes)
+        reset_buffer(self._decoder_buffer, self._decoder.unconsumed_tail)
+
+        return decoded_data.decode('utf-8')
+
+
+def bench(name, cls, messages, iterations):
+    encoder = cls()
+    with Timer() as t:
+        frames = [encoder.encode(m) for i in range(iterations)
+                  for m in messages]
+    report(name + ' encode', t.elapsed, len(frames), 'frames')
+
+    decoder = cls()
+    with Timer() as t:
+        for frame in frames:
+            decoder.decode(frame)
+    report(name + ' decode', t.elapsed, len(frames), 'frames')
+
+
+def main(iterations):
+    messages = [fixture('sample{}_decoded'.format(i)) for i in range(samples)]
+    messages.append(''.join(messages) * 50)  # a larger, multi-KB frame
+
+    if varint is not None:
+        bench('GzipFile + BytesIO', LegacyGzipEncoding, messages, iterations)
+    bench('GzipEncoding', GzipEncoding, messages, iterations)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 20000)
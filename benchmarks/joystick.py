@@ -0,0 +1,88 @@
+"""
+Compares averaging joystick input from many participants in a "move"
+handler, keeping a dict of each participant's latest position, against the
+JoystickAggregator. Each frame delivers a move from every participant and
+then reads the mean position. The cost of reading the mean is also measured
+on its own.
+
+Run this with::
+
+    python -m benchmarks.joystick [participants] [frames]
+"""
+
+import random
+from sys import argv
+from unittest.mock import Mock
+
+from interactive_python import Joystick, Scene
+from interactive_python.connection import Call
+from ._util import Timer, report
+
+
+def make_moves(participants):
+    return [Call(Mock(), {
+        'type': 'method',
+        'method': 'giveInput',
+        'params': {
+            'participantID': 'participant{}'.format(i),
+            'input': {'controlID': 'stick', 'event': 'move',
+                      'x': random.uniform(-1, 1),
+                      'y': random.uniform(-1, 1)},
+        },
+    }) for i in range(participants)]
+
+
+def bench_handler(moves, frames):
+    joystick = Joystick('stick')
+    Scene('default').attach_controls(joystick)
+    positions = {}
+
+    def on_move(call):
+        positions[call.data['participantID']] = \
+            (call.data['input']['x'], call.data['input']['y'])
+
+    def mean():
+        return (sum(x for x, y in positions.values()) / len(positions),
+                sum(y for x, y in positions.values()) / len(positions))
+
+    joystick.on('move', on_move)
+    with Timer() as t:
+        for i in range(frames):
+            for call in moves:
+                joystick._give_input(call)
+            mean()
+    report('move handler + dict', t.elapsed, frames, 'frames')
+
+    with Timer() as t:
+        for i in range(frames):
+            mean()
+    report('move handler + dict mean only', t.elapsed, frames, 'frames')
+
+
+def bench_aggregator(moves, frames):
+    joystick = Joystick('stick')
+    Scene('default').attach_controls(joystick)
+    sticks = joystick.aggregate(capacity=len(moves))
+
+    with Timer() as t:
+        for i in range(frames):
+            for call in moves:
+                joystick._give_input(call)
+            sticks.mean()
+    report('JoystickAggregator', t.elapsed, frames, 'frames')
+
+    with Timer() as t:
+        for i in range(frames):
+            sticks.mean()
+    report('JoystickAggregator mean only', t.elapsed, frames, 'frames')
+
+
+def main(participants, frames):
+    moves = make_moves(participants)
+    bench_handler(moves, frames)
+    bench_aggregator(moves, frames)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 10000,
+         int(argv[2]) if len(argv) > 2 else 50)
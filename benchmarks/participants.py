@@ -0,0 +1,111 @@
+"""
+Measures the memory used by the ParticipantRegistry, and the speed of
+filling and querying it, against keeping the protocol's participant dicts
+in a dict by session ID, as games had to before. Memory is measured with
+tracemalloc, so it counts everything allocated while filling the store.
+
+Run this with::
+
+    python -m benchmarks.participants [participants]
+"""
+
+import json
+import random
+import tracemalloc
+from sys import argv
+
+from interactive_python import ParticipantRegistry
+from ._util import Timer, report
+
+groups = ['default', 'red', 'blue', 'green']
+
+
+def make_participants(count):
+    # Round trip through JSON so each participant is built from fresh
+    # strings, as it would be when parsed off the wire.
+    return json.loads(json.dumps([{
+        'sessionID': '{:08x}-2f4b-4b4e-9a11-{:012x}'.format(i, i),
+        'userID': 1000000 + i,
+        'username': 'viewer{}'.format(i),
+        'level': random.randint(1, 100),
+        'lastInputAt': 1500000000000 + i,
+        'connectedAt': 1500000000000 + i,
+        'disabled': False,
+        'groupID': groups[i % len(groups)],
+        'meta': {},
+        'etag': '{}'.format(i),
+    } for i in range(count)]))
+
+
+class DictStore:
+    """Participants kept as their protocol dicts, keyed by session ID."""
+
+    def __init__(self):
+        self._by_session = {}
+
+    def _upsert(self, data):
+        self._by_session.setdefault(data['sessionID'], {}).update(data)
+
+    def get(self, session_id):
+        return self._by_session.get(session_id)
+
+    def by_user(self, user_id):
+        for participant in self._by_session.values():
+            if participant['userID'] == user_id:
+                return participant
+
+    def in_group(self, group_id):
+        return [p for p in self._by_session.values()
+                if p['groupID'] == group_id]
+
+
+def bench(name, store_cls, count):
+    participants = make_participants(count)
+
+    with Timer() as t:
+        store = store_cls()
+        for data in participants:
+            store._upsert(data)
+    report(name + ' join', t.elapsed, count, 'participants')
+
+    # Fill it again with tracing on, which is too slow to time.
+    del store
+    tracemalloc.start()
+    store = store_cls()
+    for data in participants:
+        store._upsert(data)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<40} {:>10,.1f} MB {:>14,.0f} bytes/participant'.format(
+        name + ' memory', memory / 1e6, memory / count))
+
+    # Drop our references to the parsed dicts, so that only what the store
+    # holds onto stays alive.
+    session_ids = [p['sessionID'] for p in participants]
+    user_ids = [p['userID'] for p in participants]
+    del participants
+
+    with Timer() as t:
+        for session_id in session_ids:
+            store.get(session_id)
+    report(name + ' by session', t.elapsed, count, 'lookups')
+
+    lookups = user_ids[:1000]
+    with Timer() as t:
+        for user_id in lookups:
+            store.by_user(user_id)
+    report(name + ' by user', t.elapsed, len(lookups), 'lookups')
+
+    with Timer() as t:
+        for i in range(100):
+            store.in_group(groups[i % len(groups)])
+    report(name + ' by group', t.elapsed, 100, 'lookups')
+
+
+def main(count):
+    bench('dicts', DictStore, count)
+    bench('ParticipantRegistry', ParticipantRegistry, count)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 100000)
@@ -0,0 +1,77 @@
+"""
+Compares the rate at which State.pump() delivers giveInput events to a
+control's handler when events go through pyee's emit(), as they used to,
+against the dispatch table State and its controls now use.
+
+Run this with::
+
+    python -m benchmarks.pump [events]
+"""
+
+import asyncio
+from sys import argv
+from unittest.mock import Mock
+
+from interactive_python import Button, Connection, State
+from interactive_python.connection import Call
+from ._util import MemorySocket, Timer, report
+
+
+class EmitState(State):
+    """State which delivers events the way it used to."""
+
+    def pump(self):
+        self._event_queue.clear()
+        while True:
+            call = self.connection.get_packet()
+            if call is None:
+                return
+
+            self.emit(call.name, call)
+
+            if self._enable_event_queue:
+                self._event_queue.append(call)
+
+
+class EmitButton(Button):
+    """Button which delivers input the way it used to."""
+
+    def _give_input(self, call):
+        self.emit(call.data['input']['event'], call)
+
+
+def bench(name, state_cls, button_cls, calls):
+    loop = asyncio.new_event_loop()
+    connection = Connection(socket=MemorySocket(loop), loop=loop)
+    state = state_cls(connection)
+    button = button_cls('button')
+    state.scene('default').attach_controls(button)
+
+    received = []
+    button.on('mousedown', received.append)
+    state.on('giveInput', lambda call: None)
+
+    connection._recv_queue.extend(calls)
+    with Timer() as t:
+        state.pump()
+    assert len(received) == len(calls)
+    report(name, t.elapsed, len(calls), 'events')
+    loop.close()
+
+
+def main(events):
+    calls = [Call(Mock(), {
+        'type': 'method',
+        'method': 'giveInput',
+        'params': {
+            'participantID': 'participant',
+            'input': {'controlID': 'button', 'event': 'mousedown'},
+        },
+    }) for i in range(events)]
+
+    bench('pyee emit', EmitState, EmitButton, calls)
+    bench('dispatch table', State, Button, calls)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 200000)
@@ -0,0 +1,79 @@
+"""
+Replays a recording of Interactive traffic into a State as fast as
+possible, and measures the rate at which the Connection reads it and
+pump() delivers it to the controls' handlers. Recordings are made by
+passing ``record`` to the Connection. Without one, a spike of input from
+a crowd of participants on a grid of buttons is synthesized.
+
+Run this with::
+
+    python -m benchmarks.replay [recording.iprec]
+"""
+
+import asyncio
+import io
+import json
+import random
+from sys import argv
+
+from interactive_python import Button, Connection, FrameRecorder, \
+    ReplaySocket, State, read_recording
+from ._util import Timer, report
+
+
+def synthesize(events=200000, participants=5000, buttons=16):
+    """Records a burst of giveInput frames arriving at ~20k/s."""
+    now = [0.0]
+    log = io.BytesIO()
+    recorder = FrameRecorder(log, clock=lambda: now[0])
+    recorder.write(json.dumps({'type': 'method', 'method': 'hello',
+                               'params': {}}))
+    for i in range(events):
+        now[0] += random.expovariate(20000)
+        recorder.write(json.dumps({
+            'type': 'method',
+            'method': 'giveInput',
+            'seq': i + 1,
+            'params': {
+                'participantID': 'participant{}'.format(
+                    random.randrange(participants)),
+                'input': {
+                    'controlID': 'button{}'.format(random.randrange(buttons)),
+                    'event': random.choice(('mousedown', 'mouseup')),
+                },
+            },
+        }, separators=(',', ':')))
+
+    log.seek(0)
+    return read_recording(log)
+
+
+def main(path):
+    frames = read_recording(path) if path else synthesize()
+    loop = asyncio.new_event_loop()
+    socket = ReplaySocket(frames, speed=None, loop=loop)
+    state = State(Connection(socket=socket, loop=loop))
+
+    counts = {'mousedown': 0, 'mouseup': 0}
+    buttons = [Button('button{}'.format(i)) for i in range(16)]
+    for button in buttons:
+        button.on('mousedown', lambda call: counts.__setitem__(
+            'mousedown', counts['mousedown'] + 1))
+    state.scene('default').attach_controls(*buttons)
+
+    with Timer() as t:
+        loop.run_until_complete(state.connection.connect())
+        loop.run_until_complete(socket.finished)
+    report('Connection read', t.elapsed, len(frames), 'frames')
+
+    events = state.pending_events
+    with Timer() as t:
+        state.pump()
+    report('State.pump', t.elapsed, events, 'events')
+
+    loop.run_until_complete(state.connection.close())
+    loop.close()
+
+
+if __name__ == '__main__':
+    main(argv[1] if len(argv) > 1 else None)
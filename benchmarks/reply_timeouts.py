@@ -0,0 +1,79 @@
+"""
+Compares the cost of issuing many concurrent calls when each reply timeout
+is tracked with its own asyncio.wait_for, as Connection used to, against the
+shared deadline heap Connection now uses.
+
+Run this with::
+
+    python -m benchmarks.reply_timeouts [calls]
+"""
+
+import asyncio
+import json
+from sys import argv
+
+from interactive_python import Connection
+from ._util import MemorySocket, Timer, report
+
+
+class WaitForConnection(Connection):
+    """Connection which times out replies the way it used to."""
+
+    async def call(self, method, params, discard=False, timeout=10):
+        packet = {
+            'type': 'method',
+            'method': method,
+            'params': params,
+            'id': self._call_counter,
+            'seq': self._last_sequence_number,
+        }
+
+        self._call_counter += 1
+        self._send(packet)
+
+        future = asyncio.Future(loop=self._loop)
+        self._awaiting_replies[packet['id']] = \
+            (future, method, self._loop.time())
+
+        try:
+            return await asyncio.wait_for(future, timeout, loop=self._loop)
+        except Exception as e:
+            self._awaiting_replies.pop(packet['id'], None)
+            raise e
+
+
+async def run_calls(connection, socket, calls):
+    await connection.connect()
+    replies = json.dumps([{'type': 'reply', 'id': i, 'result': i}
+                          for i in range(calls)])
+
+    with Timer() as t:
+        pending = [asyncio.ensure_future(connection.call('square', i),
+                                         loop=connection._loop)
+                   for i in range(calls)]
+        await asyncio.sleep(0, loop=connection._loop)
+        await socket.received.put(replies)
+        await asyncio.gather(*pending, loop=connection._loop)
+
+    await connection.close()
+    return t.elapsed
+
+
+def bench(cls, calls):
+    loop = asyncio.new_event_loop()
+    socket = MemorySocket(loop)
+    connection = cls(socket=socket, loop=loop, batch=True)
+    try:
+        return loop.run_until_complete(run_calls(connection, socket, calls))
+    finally:
+        loop.close()
+
+
+def main(calls):
+    report('asyncio.wait_for per call', bench(WaitForConnection, calls),
+           calls, 'calls')
+    report('shared deadline heap', bench(Connection, calls), calls, 'calls')
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 10000)
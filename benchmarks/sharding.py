@@ -0,0 +1,77 @@
+"""
+Measures the rate at which input is handled when a CPU-heavy handler runs
+inline in a giveInput listener, against handing it off to 1, 2, 4 and 8
+worker processes with State.shard_input(). Each run is timed from the
+first pump() until every result has come back, including the workers'
+start up. Speedups are bounded by the number of cores available.
+
+Run this with::
+
+    python -m benchmarks.sharding [events] [participants]
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from sys import argv
+from unittest.mock import Mock
+
+from interactive_python import Connection, State
+from interactive_python.connection import Call
+from ._util import MemorySocket, Timer, report
+
+
+def score(data):
+    """Stands in for anti-spam scoring, spending ~50us of CPU per input."""
+    digest = data['participantID'].encode('utf-8')
+    for i in range(100):
+        digest = hashlib.sha256(digest).digest()
+    return digest[0]
+
+
+def make_calls(events, participants):
+    return [Call(Mock(), {
+        'type': 'method',
+        'method': 'giveInput',
+        'params': {
+            'participantID': 'participant{}'.format(i % participants),
+            'input': {'controlID': 'button', 'event': 'mousedown'},
+        },
+    }) for i in range(events)]
+
+
+def bench(name, calls, workers):
+    loop = asyncio.new_event_loop()
+    state = State(Connection(socket=MemorySocket(loop), loop=loop))
+    results = []
+    state.on('inputResult', results.append)
+    if workers:
+        state.shard_input(score, workers=workers)
+    else:
+        state.on('giveInput', lambda call: results.append(score(call.data)))
+
+    with Timer() as t:
+        for i in range(0, len(calls), 1000):
+            state.connection._recv_queue.extend(calls[i:i + 1000])
+            state.pump()
+        while len(results) < len(calls):
+            time.sleep(0.001)
+            state.pump()
+
+    report(name, t.elapsed, len(calls), 'events')
+    state.stop_sharding()
+    loop.close()
+
+
+def main(events, participants):
+    print('{} cores'.format(os.cpu_count()))
+    calls = make_calls(events, participants)
+    bench('inline', calls, 0)
+    for workers in (1, 2, 4, 8):
+        bench('{} workers'.format(workers), calls, workers)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 20000,
+         int(argv[2]) if len(argv) > 2 else 1000)
@@ -0,0 +1,91 @@
+"""
+Measures how long outgoing calls made from a synchronous game loop wait
+before they're written to the socket, when the connection shares the game
+thread's event loop (which only runs between frames) against when it runs
+on ThreadedState's I/O thread. Each frame spends ``frame_ms`` blocking,
+as a render would, and makes a call halfway through it.
+
+Run this with::
+
+    python -m benchmarks.threaded [frames] [frame_ms]
+"""
+
+import asyncio
+import statistics
+import time
+from sys import argv
+
+from interactive_python import Connection, State, ThreadedState
+from ._util import MemorySocket
+
+
+class TimingSocket(MemorySocket):
+    """MemorySocket which records when each frame is written."""
+
+    def __init__(self, loop):
+        super(TimingSocket, self).__init__(loop)
+        self.sent_at = []
+
+    async def send(self, data):
+        self.sent_at.append(time.perf_counter())
+
+
+def report(name, called_at, sent_at):
+    waits = sorted((s - c) * 1000 for c, s in zip(called_at, sent_at))
+    print('{:<40} {:>8.2f} ms p50 {:>8.2f} ms p99'.format(
+        name, statistics.median(waits), waits[int(len(waits) * 0.99)]))
+
+
+def render(frame_ms):
+    time.sleep(frame_ms / 2000)
+
+
+def bench_shared(frames, frame_ms):
+    loop = asyncio.new_event_loop()
+    socket = TimingSocket(loop)
+    connection = Connection(socket=socket, loop=loop)
+    state = State(connection)
+    loop.run_until_complete(connection.connect())
+
+    called_at = []
+    for i in range(frames):
+        state.pump()
+        render(frame_ms)
+        called_at.append(time.perf_counter())
+        asyncio.ensure_future(connection.call('frame', {'n': i},
+                                              discard=True), loop=loop)
+        render(frame_ms)
+        loop.run_until_complete(asyncio.sleep(0, loop=loop))
+
+    loop.run_until_complete(connection.flush())
+    report('shared loop', called_at, socket.sent_at)
+    loop.run_until_complete(connection.close())
+    loop.close()
+
+
+def bench_threaded(frames, frame_ms):
+    loop = asyncio.new_event_loop()
+    socket = TimingSocket(loop)
+    state = ThreadedState.start(socket=socket, loop=loop)
+
+    called_at = []
+    for i in range(frames):
+        state.pump()
+        render(frame_ms)
+        called_at.append(time.perf_counter())
+        state.run(state.connection.call('frame', {'n': i}, discard=True))
+        render(frame_ms)
+
+    state.run(state.connection.flush()).result()
+    report('ThreadedState', called_at, socket.sent_at)
+    state.stop()
+
+
+def main(frames, frame_ms):
+    bench_shared(frames, frame_ms)
+    bench_threaded(frames, frame_ms)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 200,
+         float(argv[2]) if len(argv) > 2 else 16)
@@ -0,0 +1,95 @@
+"""
+Compares compressing traffic at the transport level, with the websocket
+permessage-deflate extension, against the application level encodings, for
+both CPU time and bytes on the wire. Frames are read from a file of
+recorded traffic, with one JSON frame per line, or taken from the sample
+fixtures if no file is given.
+
+permessage-deflate is measured by driving zlib the way the extension does
+(a raw deflate stream per direction, sync flushed after each message, with
+the trailing empty block stripped), rather than through the websockets
+library, whose internal API varies between versions.
+
+Run this with::
+
+    python -m benchmarks.transport_compression [iterations] [frames.txt]
+"""
+
+import zlib
+from sys import argv
+
+from interactive_python import GzipEncoding, PresetDictionaryEncoding
+from ._util import Timer, fixture, report
+
+samples = 3
+
+# (window bits, memory level) pairs to measure permessage-deflate with.
+deflate_settings = [(15, 8), (12, 8), (10, 4), (9, 1)]
+
+
+class PerMessageDeflate:
+    """
+    PerMessageDeflate compresses messages as the websocket permessage-deflate
+    extension does, with context takeover.
+    """
+
+    def __init__(self, window_bits=15, mem_level=8):
+        self._encoder = zlib.compressobj(6, zlib.DEFLATED, -window_bits,
+                                         mem_level)
+        self._decoder = zlib.decompressobj(-window_bits)
+
+    def encode(self, data):
+        data = data.encode('utf-8')
+        data = self._encoder.compress(data) + \
+            self._encoder.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-4]
+
+    def decode(self, data):
+        return self._decoder.decompress(data + b'\x00\x00\xff\xff') \
+            .decode('utf-8')
+
+
+def bench(name, make_encoding, messages, iterations):
+    encoder = make_encoding()
+    with Timer() as t:
+        frames = [encoder.encode(m) for i in range(iterations)
+                  for m in messages]
+    report(name + ' encode', t.elapsed, len(frames), 'frames')
+
+    decoder = make_encoding()
+    with Timer() as t:
+        for frame in frames:
+            decoder.decode(frame)
+    report(name + ' decode', t.elapsed, len(frames), 'frames')
+
+    raw = sum(len(m.encode('utf-8')) for m in messages) * iterations
+    sent = sum(len(f) for f in frames)
+    print('{:<40} {:>10,} bytes {:>14.2f}x'.format(name + ' size', sent,
+                                                   raw / sent))
+
+
+def main(iterations, path=None):
+    if path is None:
+        messages = [fixture('sample{}_decoded'.format(i))
+                    for i in range(samples)]
+    else:
+        with open(path) as f:
+            messages = [line.strip() for line in f if line.strip()]
+
+    raw = sum(len(m.encode('utf-8')) for m in messages) * iterations
+    print('{:<40} {:>10,} bytes'.format('uncompressed', raw))
+
+    for window_bits, mem_level in deflate_settings:
+        bench('permessage-deflate {} bits, mem {}'.format(window_bits,
+                                                          mem_level),
+              lambda: PerMessageDeflate(window_bits, mem_level),
+              messages, iterations)
+
+    bench('GzipEncoding', GzipEncoding, messages, iterations)
+    bench('PresetDictionaryEncoding', PresetDictionaryEncoding, messages,
+          iterations)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]) if len(argv) > 1 else 20000,
+         argv[2] if len(argv) > 2 else None)
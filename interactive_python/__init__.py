@@ -1,8 +1,17 @@
+from .codec import *
+from .compression import *
 from .connection import *
 from .encoding import *
 from .errors import *
+from .joystick import *
 from .oauth import *
+from .participants import *
+from .recording import *
 from .scene import *
+from .sharding import *
 from .state import *
+from .tally import *
+from .threaded import *
 from .keycodes import keycode
+from .dictionary import build_dictionary
 from ._util import until_event
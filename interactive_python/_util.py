@@ -33,13 +33,86 @@ json_encoder = OverridableJSONEncoder(check_circular=False, allow_nan=False,
                                       separators=(',', ':'))
 
 
+class DispatchingEventEmitter(EventEmitter):
+    """
+    DispatchingEventEmitter is an EventEmitter which keeps a table of the
+    handlers for each event, so that hot paths can call them directly
+    through _dispatch() rather than going through emit(). The table is
+    filled in as events are dispatched and cleared whenever handlers are
+    added or removed. This relies on the way pyee 6 and later store
+    handlers.
+
+    As pyee's emit() did before pyee 9, handlers which return a coroutine
+    have it scheduled on the loop returned by _handler_loop(), and any
+    exception it raises is emitted as an ``error`` event.
+    """
+
+    def __init__(self):
+        EventEmitter.__init__(self)
+        self._dispatch_table = {}
+
+    def _dispatch(self, event, *args):
+        """
+        Calls the handlers for the event with the arguments. Returns
+        whether there were any handlers.
+        :rtype: bool
+        """
+        try:
+            handlers = self._dispatch_table[event]
+        except KeyError:
+            handlers = tuple(self._events[event].values()) \
+                if event in self._events else ()
+            self._dispatch_table[event] = handlers
+
+        for handler in handlers:
+            result = handler(*args)
+            if result is not None and asyncio.iscoroutine(result):
+                self._schedule(result)
+
+        return len(handlers) > 0
+
+    def _handler_loop(self):
+        """
+        Returns the loop to run coroutine handlers on, or None to use the
+        current thread's event loop.
+        :rtype: asyncio.AbstractEventLoop
+        """
+        return None
+
+    def _schedule(self, coroutine):
+        future = asyncio.ensure_future(coroutine, loop=self._handler_loop())
+        future.add_done_callback(self._report_handler_error)
+
+    def _report_handler_error(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.emit('error', future.exception())
+
+    def _add_event_handler(self, event, k, v):
+        self._dispatch_table.clear()
+        return super()._add_event_handler(event, k, v)
+
+    def _remove_listener(self, event, f):
+        self._dispatch_table.clear()
+        return super()._remove_listener(event, f)
+
+    def remove_listener(self, event, f):
+        self._dispatch_table.clear()
+        return super().remove_listener(event, f)
+
+    def remove_all_listeners(self, event=None):
+        self._dispatch_table.clear()
+        return super().remove_all_listeners(event)
+
+
 class ChangeTracker:
     """
     ChangeTracker is a simple structure that keeps track of changes made to
     properties of the object.
     """
 
-    def __init__(self, data={}, intrinsic_properties=[]):
+    def __init__(self, data=None, intrinsic_properties=()):
+        if data is None:
+            data = {}
         self._intrinsic_properties = intrinsic_properties
         self._nested_trackers = [(key, value) for key, value in data.items()
                                  if isinstance(value, ChangeTracker)]
@@ -101,6 +174,40 @@ class ChangeTracker:
         Marks the changed properties on the resource as having been saved.
         """
         self._changes.clear()
+        for key, tracker in self._nested_trackers:
+            tracker._mark_synced()
+
+    def _snapshot(self):
+        """
+        Returns a JSON-serializable dict of the tracker's data and which
+        properties have changed, for :func:`_restore` to load.
+        :rtype: dict
+        """
+        nested = dict(self._nested_trackers)
+        return {
+            'data': {key: value for key, value in self._data.items()
+                     if key not in nested},
+            'changes': sorted(self._changes),
+            'nested': {key: tracker._snapshot()
+                       for key, tracker in nested.items()},
+        }
+
+    def _restore(self, snapshot):
+        """
+        Replaces the tracker's data and changes with those in a snapshot
+        taken by :func:`_snapshot`.
+        :type snapshot: dict
+        """
+        data = dict(snapshot['data'])
+        for key, nested in snapshot['nested'].items():
+            tracker = ChangeTracker()
+            tracker._restore(nested)
+            data[key] = tracker
+
+        self._data = data
+        self._nested_trackers = [(key, value) for key, value in data.items()
+                                 if isinstance(value, ChangeTracker)]
+        self._changes = set(snapshot['changes'])
 
     def _set_and_track_property(self, key, value):
         previous_value = self._data.get(key, None)
@@ -129,7 +236,7 @@ class ChangeTracker:
         return self._data[key]
 
 
-class Resource(EventEmitter, ChangeTracker):
+class Resource(DispatchingEventEmitter, ChangeTracker):
     """Resource represents some taggable, metadata-attachable construct in
     Interactive. Scenes, groups, and participants are resources.
     """
@@ -140,7 +247,7 @@ class Resource(EventEmitter, ChangeTracker):
             intrinsic_properties=[id_property],
             data={id_property: id, 'meta': ChangeTracker()}
         )
-        EventEmitter.__init__(self)
+        DispatchingEventEmitter.__init__(self)
 
         self._id_property = id_property
         self._connection = None
@@ -159,6 +266,23 @@ class Resource(EventEmitter, ChangeTracker):
         """
         self._connection = connection
 
+    def _handler_loop(self):
+        if self._connection is None:
+            return None
+        return self._connection._loop
+
+    def _schedule(self, coroutine):
+        # Input may be dispatched on another thread than the connection's
+        # loop runs on, as with a ThreadedState.
+        if self._connection is not None and \
+                self._connection._off_loop_thread():
+            asyncio.run_coroutine_threadsafe(
+                coroutine, self._connection._loop).add_done_callback(
+                    self._report_handler_error)
+            return
+
+        super()._schedule(coroutine)
+
     def _apply_changes(self, change, call):
         """
         Applies a complete update of properties from the remote server.
@@ -175,3 +299,33 @@ class Resource(EventEmitter, ChangeTracker):
         :type call: Call
         """
         self.emit('delete', call)
+
+    # Properties which _diff doesn't compare.
+    _diff_ignored = ('etag',)
+
+    def _diff(self, remote):
+        """
+        Returns an update for the properties whose values differ from those
+        in the remote copy of the resource, with the remote etag, or None
+        if there are no differences.
+        :type remote: dict
+        :rtype: dict
+        """
+        output = {}
+        for key, value in self._data.items():
+            if key in self._diff_ignored:
+                continue
+            if isinstance(value, ChangeTracker):
+                value = value.to_json()
+            missing = {} if isinstance(value, dict) else None
+            if remote.get(key, missing) != value:
+                output[key] = value
+
+        if not output:
+            return None
+
+        output[self._id_property] = self.id
+        if 'etag' in remote:
+            output['etag'] = remote['etag']
+
+        return output
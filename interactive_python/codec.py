@@ -0,0 +1,154 @@
+from abc import abstractmethod
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _to_json(obj):
+    """
+    Serialization hook for objects which JSON libraries don't natively know
+    about. Resources, and anything else with a to_json method, are
+    serialized as the result of that method.
+    """
+    try:
+        to_json = obj.to_json
+    except AttributeError:
+        raise TypeError('{!r} is not JSON serializable'.format(obj))
+
+    return to_json()
+
+
+class Codec:
+    """Codec is an abstract class that defines how packets are serialized
+    to and parsed from JSON. Connections use the fastest available codec by
+    default (see :func:`~interactive_python.default_codec`), but you can pass
+    your own in using the ``codec`` argument.
+    """
+
+    @abstractmethod
+    def dumps(self, obj):
+        """ dumps takes an object and returns its JSON string """
+        pass
+
+    @abstractmethod
+    def loads(self, data):
+        """ loads takes a JSON string or UTF-8 byte slice and returns the
+        object it represents """
+        pass
+
+    def unwrap(self, data, count):
+        """ unwrap takes a serialized array of count packets and returns its
+        contents, in a form which can be passed to join """
+        return data[1:-1]
+
+    def join(self, items, count):
+        """ join takes a list of serialized packets, or unwrapped arrays of
+        packets, holding count packets in total, and returns a serialized
+        array of all of them """
+        return '[' + ','.join(items) + ']'
+
+
+class JSONCodec(Codec):
+    """JSONCodec uses Python's built-in json module."""
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(check_circular=False, allow_nan=False,
+                                         separators=(',', ':'),
+                                         default=_to_json)
+        self._decoder = json.JSONDecoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        if not isinstance(data, str):
+            data = str(data, 'utf-8')
+
+        return self._decoder.decode(data)
+
+
+class OrjsonCodec(Codec):
+    """OrjsonCodec uses the `orjson <https://github.com/ijl/orjson>`_
+    library, which must be installed, and which parses and serializes JSON
+    several times faster than the built-in module. It can parse directly from
+    the bytes that binary encodings decode to.
+
+    Its output matches the JSONCodec's, with a few exceptions: NaN and
+    infinite floats are serialized as null rather than raising a ValueError,
+    and datetimes, dataclasses, UUIDs and numpy arrays are serialized
+    natively rather than raising a TypeError. Integers too large for orjson
+    are handed to the built-in module.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('orjson must be installed to use OrjsonCodec')
+
+        self._fallback = JSONCodec()
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, default=_to_json,
+                                option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # orjson only serializes 64-bit integers.
+            return self._fallback.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MessagePackCodec(Codec):
+    """MessagePackCodec serializes packets to `MessagePack
+    <https://msgpack.org/>`_ rather than JSON, using the msgpack library,
+    which must be installed. It's used by the
+    :class:`~interactive_python.MessagePackEncoding`, and shouldn't be
+    passed to the Connection directly.
+    """
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('msgpack must be installed to use '
+                              'MessagePackCodec')
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, default=_to_json, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+    def unwrap(self, data, count):
+        return data[len(_msgpack_array_header(count)):]
+
+    def join(self, items, count):
+        return _msgpack_array_header(count) + b''.join(items)
+
+
+def _msgpack_array_header(count):
+    if count < 16:
+        return bytes((0x90 | count,))
+    if count < 0x10000:
+        return b'\xdc' + count.to_bytes(2, 'big')
+
+    return b'\xdd' + count.to_bytes(4, 'big')
+
+
+def default_codec():
+    """
+    Returns an OrjsonCodec if orjson is installed, or a JSONCodec otherwise.
+    See the OrjsonCodec for the few ways in which their output differs.
+
+    :rtype: Codec
+    """
+    if orjson is not None:
+        return OrjsonCodec()
+
+    return JSONCodec()
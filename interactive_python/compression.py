@@ -0,0 +1,172 @@
+import asyncio
+import time
+import zlib
+
+from .encoding import GzipEncoding, TextEncoding
+from .log import logger
+
+
+class CompressionController:
+    """
+    CompressionController switches a Connection between text and gzip
+    encoding at runtime, depending on which is cheaper for the traffic it
+    sees. Pass one into the Connection to use it::
+
+        connection = Connection(
+            address=get_interactive_address(),
+            compression_controller=CompressionController())
+
+    Every ``window`` seconds it looks at the frames sent and received in that
+    window. It prefers gzip when frames average at least ``min_frame_size``
+    bytes, compress by at least ``min_ratio``, and compressing them costs no
+    more than ``max_cpu`` of a core. While in text mode, the ratio and CPU
+    cost are estimated by compressing every ``sample_every``'th frame.
+
+    To avoid flapping, gzip is only dropped once the traffic falls past the
+    thresholds by the ``hysteresis`` fraction, and either switch is only
+    made once ``patience`` consecutive windows agree on it.
+    """
+
+    def __init__(self, window=5, patience=3, min_frame_size=256, min_ratio=2,
+                 max_cpu=0.02, hysteresis=0.25, sample_every=20,
+                 compression_level=6, clock=time.monotonic):
+        self._window = window
+        self._patience = patience
+        self._min_frame_size = min_frame_size
+        self._min_ratio = min_ratio
+        self._max_cpu = max_cpu
+        self._hysteresis = hysteresis
+        self._sample_every = sample_every
+        self._compression_level = compression_level
+        self._clock = clock
+
+        self._connection = None
+        self._switching = False
+        self._votes = 0
+        self._reset_window()
+
+    def attach(self, connection):
+        """
+        Called by the Connection the controller is passed to.
+        :type connection: Connection
+        """
+        self._connection = connection
+
+    def _reset_window(self):
+        self._window_start = self._clock()
+        self._frames = 0
+        self._decoded_bytes = 0
+        self._encoded_bytes = 0
+        self._seconds = 0
+        self._sampled_bytes = 0
+        self._sampled_compressed_bytes = 0
+        self._sampled_seconds = 0
+
+    def record(self, data, encoded_length, seconds):
+        """
+        Records a frame sent or received by the connection. Called by the
+        Connection for every frame.
+
+        :param data: the decoded frame
+        :param encoded_length: the length of the frame on the wire
+        :param seconds: the time spent encoding or decoding the frame
+        """
+        self._frames += 1
+        self._decoded_bytes += len(data)
+        self._encoded_bytes += encoded_length
+        self._seconds += seconds
+
+        if self._mode() == 'text' and self._frames % self._sample_every == 0:
+            self._sample(data)
+
+        elapsed = self._clock() - self._window_start
+        if elapsed >= self._window:
+            self._evaluate(elapsed)
+
+    def _mode(self):
+        return self._connection._encoding.name()
+
+    def _sample(self, data):
+        """
+        Estimates the ratio and cost of compressing the frame with gzip.
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        started = time.perf_counter()
+        compressor = zlib.compressobj(self._compression_level, zlib.DEFLATED,
+                                      -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + \
+            compressor.flush(zlib.Z_SYNC_FLUSH)
+        self._sampled_seconds += time.perf_counter() - started
+        self._sampled_bytes += len(data)
+        self._sampled_compressed_bytes += len(compressed)
+
+    def _choose(self, elapsed):
+        """
+        Returns the mode which the traffic in the current window favors.
+        :rtype: str
+        """
+        mode = self._mode()
+        if self._frames == 0:
+            return mode
+
+        if mode == 'gzip':
+            ratio = self._decoded_bytes / max(self._encoded_bytes, 1)
+            cpu = self._seconds / elapsed
+        elif self._sampled_bytes > 0:
+            ratio = self._sampled_bytes / \
+                max(self._sampled_compressed_bytes, 1)
+            cpu = self._sampled_seconds / self._sampled_bytes * \
+                self._decoded_bytes / elapsed
+        else:
+            return mode
+
+        frame_size = self._decoded_bytes / self._frames
+        if mode == 'gzip':
+            slack = 1 - self._hysteresis
+            keep = frame_size >= self._min_frame_size * slack and \
+                ratio >= self._min_ratio * slack and \
+                cpu <= self._max_cpu * (1 + self._hysteresis)
+            return 'gzip' if keep else 'text'
+
+        upgrade = frame_size >= self._min_frame_size and \
+            ratio >= self._min_ratio and cpu <= self._max_cpu
+        return 'gzip' if upgrade else 'text'
+
+    def _evaluate(self, elapsed):
+        mode = self._mode()
+        if mode not in ('text', 'gzip'):
+            self._reset_window()
+            return  # another scheme was chosen explicitly; leave it be
+
+        choice = self._choose(elapsed)
+        self._reset_window()
+
+        if choice == mode or self._switching:
+            self._votes = 0
+            return
+
+        self._votes += 1
+        if self._votes < self._patience:
+            return
+
+        self._votes = 0
+        self._switching = True
+        if choice == 'gzip':
+            scheme = GzipEncoding(self._compression_level)
+        else:
+            scheme = TextEncoding()
+
+        asyncio.ensure_future(self._switch(scheme),
+                              loop=self._connection._loop)
+
+    async def _switch(self, scheme):
+        try:
+            await self._connection.set_compression(scheme)
+        except Exception:
+            logger.info("error switching Interactive compression",
+                        exc_info=True)
+        finally:
+            self._switching = False
+            self._reset_window()
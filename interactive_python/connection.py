@@ -1,22 +1,127 @@
 import asyncio
-import json
+import heapq
+import re
+import threading
+import time
 import websockets
 import collections
+from websockets.extensions.permessage_deflate import \
+    ClientPerMessageDeflateFactory
 
 from .log import logger
-from .encoding import Encoding, TextEncoding
-from ._util import json_encoder
+from .encoding import Encoding, MessagePackEncoding, TextEncoding
+from .errors import CallError, SendQueueFullError, WriterDiedError
+from .codec import default_codec
+from .metrics import ConnectionMetrics
+from .recording import FrameRecorder
+
+
+# Matches top-level envelope fields with a string or integer value. Used
+# to route and filter packets before parsing them in full.
+_envelope_pattern = r'"(type|method|id|seq)"\s*:\s*(?:"([^"\\]*)"|(\d+))'
+_envelope_re = re.compile(_envelope_pattern)
+_envelope_re_bytes = re.compile(_envelope_pattern.encode('ascii'))
+
+# Encodings which are cheap enough to never be worth offloading.
+_uncompressed_encodings = (TextEncoding, MessagePackEncoding)
+
+
+def _read_envelope(frame):
+    """
+    Extracts the type, method, id and seq of a frame containing a single
+    method packet without parsing it. Returns None if the frame isn't a
+    single object or if its envelope is ambiguous, for example because one
+    of the fields also appears within the params.
+
+    :rtype: dict
+    """
+    if isinstance(frame, str):
+        if frame[:1] != '{':
+            return None
+        matches = _envelope_re.findall(frame)
+    else:
+        if frame[:1] != b'{':
+            return None
+        matches = [(k.decode('ascii'), s.decode('utf-8'), n)
+                   for k, s, n in _envelope_re_bytes.findall(frame)]
+
+    envelope = {}
+    for key, string, number in matches:
+        if key in envelope:
+            return None
+        envelope[key] = int(number) if number else string
+
+    if envelope.get('type') != 'method' or 'method' not in envelope:
+        return None
+
+    return envelope
+
+
+_deflate_settings = ('client_max_window_bits', 'server_max_window_bits',
+                     'mem_level', 'compression_level')
+
+
+def _transport_options(permessage_deflate):
+    """
+    Returns the keyword arguments to open the websocket with, given the
+    Connection's ``permessage_deflate`` setting.
+
+    :rtype: dict
+    """
+    if permessage_deflate is None:
+        return {}
+    if permessage_deflate is False:
+        return {'compression': None}
+    if permessage_deflate is True:
+        permessage_deflate = {}
+
+    for key in permessage_deflate:
+        if key not in _deflate_settings:
+            raise ValueError('Unknown permessage-deflate setting {}'.format(
+                key))
+
+    compress_settings = {}
+    if 'mem_level' in permessage_deflate:
+        compress_settings['memLevel'] = permessage_deflate['mem_level']
+    if 'compression_level' in permessage_deflate:
+        compress_settings['level'] = permessage_deflate['compression_level']
+
+    return {'extensions': [ClientPerMessageDeflateFactory(
+        client_max_window_bits=permessage_deflate.get(
+            'client_max_window_bits', True),
+        server_max_window_bits=permessage_deflate.get(
+            'server_max_window_bits'),
+        compress_settings=compress_settings or None)]}
 
 
 class Call:
-    def __init__(self, connection, payload):
+    """
+    A Call is an incoming message from the Interactive service. Calls can be
+    created lazily from an unparsed frame, in which case only the method
+    name and ID are known up front and the frame is parsed the first time
+    the call's data is accessed.
+    """
+
+    __slots__ = ('_connection', '_payload', '_frame', '_method', '_id')
+
+    def __init__(self, connection, payload=None, frame=None, method=None,
+                 call_id=None):
         """
-        A Call is an incoming message from the Interactive service.
         :param connection: the connection
-        :param payload:
+        :param payload: the parsed packet
+        :param frame: the unparsed packet, if payload is not given
+        :param method: the method name, if payload is not given
+        :param call_id: the packet ID, if payload is not given
         """
         self._connection = connection
         self._payload = payload
+        self._frame = frame
+        if payload is not None:
+            self._method = payload['method']
+            self._id = payload.get('id')
+        else:
+            self._method = method
+            self._id = call_id
 
     @property
     def name(self):
@@ -24,7 +129,15 @@ class Call:
         :return: The name of the method being called.
         :rtype: str
         """
-        return self._payload['method']
+        return self._method
+
+    @property
+    def id(self):
+        """
+        :return: The ID of the packet, used to reply to it.
+        :rtype: int
+        """
+        return self._id
 
     @property
     def data(self):
@@ -32,9 +145,13 @@ class Call:
         :return: The payload of the method being called.
         :rtype: dict
         """
+        if self._payload is None:
+            self._payload = self._connection._text_codec.loads(self._frame)
+            self._frame = None
+
         return self._payload['params']
 
-    def reply_error(self, result):
+    def reply(self, result):
         """
         Submits a successful reply for the call.
         :param result: The result to send to tetrisd
@@ -59,12 +176,91 @@ class Connection:
             address=get_interactive_address(),
             authorization="Bearer {}".format(my_oauth_token),
             interactive_version_id=1234)
+
+    Outgoing packets can optionally be batched. When ``batch`` is True, every
+    packet sent within the same tick of the event loop (or within
+    ``batch_window`` seconds, if given) is encoded and sent as a single JSON
+    array frame, up to ``batch_max_bytes`` of JSON per frame.
+
+    Packets are written to the socket in order by a single writer task. The
+    send queue can be bounded by passing ``send_queue_size``, and
+    ``send_overflow`` determines what happens once it's full:
+
+     - ``block`` (the default) makes :func:`call` wait until there's room in
+       the queue. Replies are always queued.
+     - ``raise`` raises a :class:`~interactive_python.SendQueueFullError`.
+     - ``drop`` drops the oldest discardable packet (that is, calls made with
+       ``discard=True``) from the queue, raising a SendQueueFullError if
+       there are none.
+
+    The send queue has two lanes. Replies, and calls made with
+    ``priority=True``, go in the priority lane so that they aren't held up
+    behind large bulk updates. ``send_policy`` decides how the lanes share
+    the socket:
+
+     - ``strict`` (the default) always writes priority packets first.
+     - ``weighted`` writes up to ``priority_weight`` priority frames for each
+       bulk frame while both lanes have packets waiting.
+     - ``fifo`` disables the priority lane, writing everything in order.
+
+    Packets are serialized by a :class:`~interactive_python.Codec`. By
+    default this uses orjson if it's installed, falling back to Python's
+    json module otherwise. Encodings such as the
+    :class:`~interactive_python.MessagePackEncoding` bring their own codec,
+    which replaces this one for as long as they're in use.
+
+    Methods which you don't care about can be dropped as soon as they're
+    received, before they're parsed, by passing their names in
+    ``ignore_methods`` or to :func:`ignore`. If ``lazy_calls`` is True,
+    incoming method calls are queued without parsing their params until
+    :attr:`Call.data` is first accessed.
+
+    Metrics about the connection can be read at any time from
+    :func:`metrics_snapshot`. If a ``metrics_callback`` is given, it's called
+    with the snapshot every ``metrics_interval`` seconds.
+
+    Rather than calling :func:`set_compression` yourself, you can pass a
+    :class:`~interactive_python.CompressionController` as
+    ``compression_controller`` to switch between text and gzip encoding
+    automatically.
+
+    Besides the compression schemes above, which work on each message, the
+    websocket itself can compress frames with the permessage-deflate
+    extension, if the server supports it. ``permessage_deflate`` may be
+    None to use the websockets library's default, False to turn it off,
+    True to ask for it, or a dict of settings to ask for it with:
+
+     - ``client_max_window_bits``: the window size, from 9 to 15 bits, which
+       we compress with. Smaller windows use less memory.
+     - ``server_max_window_bits``: the window size to ask the server to
+       compress with.
+     - ``mem_level``: the zlib memory level, from 1 to 9, which we compress
+       with.
+     - ``compression_level``: the zlib compression level, from 0 to 9.
+
+    Compressing and decompressing large frames can block the event loop
+    for several milliseconds. If ``offload_threshold`` is given, frames of at
+    least that many bytes are compressed and decompressed on the
+    ``executor`` (or the loop's default executor) instead. Received frames
+    are measured by their compressed size.
+
+    Every frame received can be recorded to a file by passing its path, or
+    a :class:`~interactive_python.FrameRecorder`, as ``record``. Recordings
+    can be played back into a Connection with a
+    :class:`~interactive_python.ReplaySocket` passed as its ``socket``.
     """
 
     def __init__(self, address=None, authorization=None,
                  project_version_id=None, project_sharecode=None,
                  extra_headers={}, loop=asyncio.get_event_loop(), socket=None,
-                 protocol_version="2.0"):
+                 protocol_version="2.0", batch=False, batch_window=0,
+                 batch_max_bytes=64 * 1024, send_queue_size=None,
+                 send_overflow='block', codec=None, ignore_methods=(),
+                 lazy_calls=False, metrics_callback=None,
+                 metrics_interval=10, send_policy='strict',
+                 priority_weight=4, compression_controller=None,
+                 offload_threshold=None, executor=None,
+                 permessage_deflate=None, record=None):
 
         if authorization is not None:
             extra_headers['Authorization'] = authorization
@@ -75,18 +271,73 @@ class Connection:
         extra_headers['X-Protocol-Version'] = protocol_version
 
         self._socket_or_connector = socket or websockets.client.connect(
-            address, loop=loop, extra_headers=extra_headers)
+            address, loop=loop, extra_headers=extra_headers,
+            **_transport_options(permessage_deflate))
         self._socket = None
 
         self._loop = loop
         self._encoding = TextEncoding()
+        self._text_codec = codec or default_codec()
+        self._codec = self._text_codec
         self._awaiting_replies = {}
+        self._reply_deadlines = []
+        self._reply_timer = None
         self._call_counter = 0
         self._last_sequence_number = 0
 
         self._recv_queue = collections.deque()
         self._recv_await = None
         self._recv_task = None
+        self._ignored_methods = set(ignore_methods)
+        self._packets_ignored = 0
+        self._lazy_calls = lazy_calls
+
+        self.metrics = ConnectionMetrics()
+        self._metrics_callback = metrics_callback
+        self._metrics_interval = metrics_interval
+        self._metrics_timer = None
+
+        if record is not None and not isinstance(record, FrameRecorder):
+            record = FrameRecorder(record)
+        self._recorder = record
+
+        self._offload_threshold = offload_threshold
+        self._executor = executor
+        self._frames_offloaded = 0
+
+        self._compression_controller = compression_controller
+        if compression_controller is not None:
+            compression_controller.attach(self)
+
+        self._batch = batch
+        self._batch_window = batch_window
+        self._batch_max_bytes = batch_max_bytes
+        self._frames_sent = 0
+        self._packets_sent = 0
+        self._packets_dropped = 0
+        self._packets_per_frame = collections.Counter()
+
+        if send_overflow not in ('block', 'raise', 'drop'):
+            raise ValueError('Unknown send overflow policy {}'.format(
+                send_overflow))
+
+        if send_policy not in ('fifo', 'strict', 'weighted'):
+            raise ValueError('Unknown send policy {}'.format(send_policy))
+
+        self._send_queue_size = send_queue_size
+        self._send_overflow = send_overflow
+        self._send_queue = collections.deque()
+        self._priority_send_queue = collections.deque()
+        self._send_policy = send_policy
+        self._priority_weight = priority_weight
+        self._priority_streak = 0
+        self._send_queue_bytes = 0
+        self._send_await = None
+        self._send_waiters = []
+        self._send_task = None
+        self._writer_error = None
+        self._bytes_in_flight = 0
+        self._loop_thread = None
 
     async def connect(self):
         """
@@ -95,6 +346,7 @@ class Connection:
         if something, such as authentication, fails.
         """
 
+        self._loop_thread = threading.get_ident()
         if not hasattr(self._socket_or_connector, '__await__'):
             self._socket = self._socket_or_connector
         else:
@@ -109,37 +361,87 @@ class Connection:
             self._recv_queue.append(packet)
 
         self._recv_task = asyncio.ensure_future(self._read(), loop=self._loop)
+        self._send_task = asyncio.ensure_future(self._write(), loop=self._loop)
+
+        if self._metrics_callback is not None:
+            self._metrics_timer = self._loop.call_later(
+                self._metrics_interval, self._report_metrics)
 
     def _fallback_to_plain_text(self):
         if isinstance(self._encoding, TextEncoding):
             return  # we're already falling back
 
-        self._encoding = TextEncoding()
+        self._use_encoding(TextEncoding())
         asyncio.ensure_future(
             self.set_compression(TextEncoding()), loop=self._loop)
 
-    def _decode(self, data):
+    def _use_encoding(self, encoding):
         """
-        Converts the packet data to a string,
-        decompressing it if necessary. Always returns a string.
+        Switches to the encoding, along with the codec it requires. Packets
+        still waiting in the send queue are re-serialized if the codec
+        changes.
+        """
+        old_codec = self._codec
+        self._encoding = encoding
+        self._codec = encoding.codec() or self._text_codec
+        if self._codec is old_codec:
+            return
+
+        for queue in (self._send_queue, self._priority_send_queue):
+            for i, (data, packet_count, discardable) in enumerate(queue):
+                converted = self._codec.dumps(old_codec.loads(data))
+                queue[i] = (converted, packet_count, discardable)
+                self._send_queue_bytes += len(converted) - len(data)
+
+    def _codec_for(self, frame):
+        """
+        Returns the codec to parse a received frame with. Text frames are
+        always JSON, even if they arrive just after switching to a binary
+        serialization.
+        """
+        if isinstance(frame, str):
+            return self._text_codec
+
+        return self._codec
+
+    async def _run_encoding(self, fn, data):
+        """
+        Runs the encoding's encode or decode function on the data. Large
+        frames are handed off to the executor so that they don't block the
+        event loop. Since frames are only ever encoded by the writer task and
+        decoded by the reader, one at a time, the encoding's stream state
+        still sees them in order.
+        """
+        if self._offload_threshold is None or \
+                len(data) < self._offload_threshold or \
+                isinstance(self._encoding, _uncompressed_encodings):
+            return fn(data)
+
+        self._frames_offloaded += 1
+        return await self._loop.run_in_executor(self._executor, fn, data)
+
+    async def _decode(self, data):
+        """
+        Decompresses the packet data if necessary. Returns a string or
+        UTF-8 bytes which the codec can parse.
         """
         if isinstance(data, str):
             return data
 
         try:
-            return self._encoding.decode(data)
+            return await self._run_encoding(self._encoding.decode_bytes, data)
         except Exception as e:
             self._fallback_to_plain_text()
             logger.info("error decoding Interactive message, falling back to"
                         "plain text", extra=e)
 
-    def _encode(self, data):
+    async def _encode(self, data):
         """
         Converts the packet data to a string or byte array,
         compressing it if necessary.
         """
         try:
-            return self._encoding.encode(data)
+            return await self._run_encoding(self._encoding.encode, data)
         except Exception as e:
             self._fallback_to_plain_text()
             logger.warn("error encoding Interactive message, falling back to"
@@ -155,29 +457,401 @@ class Connection:
         if 'seq' in data:
             self._last_sequence_number = data['seq']
 
+        if data['type'] == 'method' and \
+                data['method'] in self._ignored_methods:
+            self._packets_ignored += 1
+            return
+
         if data['type'] == 'reply':
-            if data['id'] in self._awaiting_replies:
-                self._awaiting_replies[data['id']]. \
-                    set_result(data['result'])
-                del self._awaiting_replies[data['id']]
+            awaiting = self._awaiting_replies.pop(data['id'], None)
+            if awaiting is None:
+                return
+
+            future, method, started = awaiting
+            metrics = self.metrics.methods[method]
+            metrics.latency.record(self._loop.time() - started)
+            if future.done():
+                return  # the caller has stopped waiting
+
+            if data.get('error') is not None:
+                metrics.errors += 1
+                future.set_exception(CallError(data['error']))
+            else:
+                future.set_result(data.get('result'))
 
             return
 
-        self._recv_queue.append(Call(self, data))
+        self._queue_call(Call(self, data))
+
+    def _handle_frame(self, frame):
+        """
+        Handles a frame received from the Interactive service, containing
+        one or more packets.
+        """
+        if self._lazy_calls or self._ignored_methods:
+            envelope = _read_envelope(frame)
+            if envelope is not None:
+                if 'seq' in envelope:
+                    self._last_sequence_number = envelope['seq']
+
+                if envelope['method'] in self._ignored_methods:
+                    self._packets_ignored += 1
+                    return
+
+                if self._lazy_calls:
+                    self._queue_call(Call(self, frame=frame,
+                                          method=envelope['method'],
+                                          call_id=envelope.get('id')))
+                    return
+
+        data = self._codec_for(frame).loads(frame)
+        if isinstance(data, list):
+            for item in data:
+                self._handle_recv(item)
+        else:
+            self._handle_recv(data)
+
+    def _queue_call(self, call):
+        self._recv_queue.append(call)
         if self._recv_await is not None:
             self._recv_await.set_result(True)
             self._recv_await = None
 
-    def _send(self, payload):
+    def _send(self, payload, discardable=False, priority=False):
         """
-        Encodes and sends a dict payload.
+        Encodes a dict payload and adds it to the send queue to be written
+        by the writer task. Discardable packets may be dropped if the queue
+        overflows and the "drop" overflow policy is in use. Priority packets
+        are queued in the priority lane.
+
+        If it's called from a thread other than the one running the loop,
+        such as the game thread of a
+        :class:`~interactive_python.ThreadedState`, the payload is handed to
+        the loop's thread to be queued there.
         """
-        future = self._socket.send(self._encode(json_encoder.encode(payload)))
-        asyncio.ensure_future(future, loop=self._loop)
+        if self._off_loop_thread():
+            self._loop.call_soon_threadsafe(
+                self._send, payload, discardable, priority)
+            return
 
-    async def _read_single(self):
+        self._enqueue(self._codec.dumps(payload), 1, discardable, priority)
+
+    def _send_many(self, payloads, discardable=False, priority=False):
         """
-        Reads a single event off the websocket.
+        Encodes a list of dict payloads and adds them to the send queue as
+        a single entry, which will be written in one array frame.
+        """
+        if self._off_loop_thread():
+            self._loop.call_soon_threadsafe(
+                self._send_many, payloads, discardable, priority)
+            return
+
+        data = self._codec.join([self._codec.dumps(p) for p in payloads],
+                                len(payloads))
+        self._enqueue(data, len(payloads), discardable, priority)
+
+    def _off_loop_thread(self):
+        return self._loop_thread is not None and \
+            threading.get_ident() != self._loop_thread
+
+    def _enqueue(self, data, packet_count, discardable, priority):
+        if self._writer_error is not None:
+            raise WriterDiedError() from self._writer_error
+
+        if self._send_queue_full():
+            if self._send_overflow == 'raise':
+                raise SendQueueFullError()
+            if self._send_overflow == 'drop' and not self._drop_discardable():
+                raise SendQueueFullError()
+
+        if priority and self._send_policy != 'fifo':
+            queue = self._priority_send_queue
+        else:
+            queue = self._send_queue
+
+        queue.append((data, packet_count, discardable))
+        self._send_queue_bytes += len(data)
+
+        if self._send_await is not None and not self._send_await.done():
+            self._send_await.set_result(None)
+
+    def _send_queue_depth(self):
+        return len(self._send_queue) + len(self._priority_send_queue)
+
+    def _send_queue_full(self):
+        return self._send_queue_size is not None and \
+            self._send_queue_depth() >= self._send_queue_size
+
+    def _drop_discardable(self):
+        """
+        Removes the oldest discardable entry from the send queue, looking in
+        the bulk lane first. Returns False if there were no discardable
+        entries to drop.
+        """
+        for queue in (self._send_queue, self._priority_send_queue):
+            for i, (data, packet_count, discardable) in enumerate(queue):
+                if discardable:
+                    del queue[i]
+                    self._send_queue_bytes -= len(data)
+                    self._packets_dropped += packet_count
+                    return True
+
+        return False
+
+    def _next_send_lane(self):
+        """
+        Returns the lane of the send queue to take the next frame from,
+        according to the send policy.
+        """
+        if len(self._priority_send_queue) == 0:
+            self._priority_streak = 0
+            return self._send_queue
+
+        if len(self._send_queue) == 0 or self._send_policy == 'strict':
+            return self._priority_send_queue
+
+        if self._priority_streak >= self._priority_weight:
+            self._priority_streak = 0
+            return self._send_queue
+
+        self._priority_streak += 1
+        return self._priority_send_queue
+
+    def _take_frame(self):
+        """
+        Removes and returns the data for the next frame from the send queue,
+        and the number of packets it contains. When batching is enabled, this
+        merges as many queued packets from the same lane as fit into a
+        single array.
+        """
+        queue = self._next_send_lane()
+        first, packet_count, _ = queue.popleft()
+        self._send_queue_bytes -= len(first)
+        if not self._batch or len(queue) == 0:
+            return first, packet_count
+
+        codec = self._codec
+        buffer = [codec.unwrap(first, packet_count)
+                  if packet_count > 1 else first]
+        size = len(first) + 1
+        while len(queue) > 0:
+            data, count, _ = queue[0]
+            if size + len(data) + 1 > self._batch_max_bytes:
+                break
+
+            queue.popleft()
+            self._send_queue_bytes -= len(data)
+            buffer.append(codec.unwrap(data, count) if count > 1 else data)
+            size += len(data) + 1
+            packet_count += count
+
+        if len(buffer) == 1:
+            return first, packet_count
+
+        return codec.join(buffer, packet_count), packet_count
+
+    async def _write(self):
+        """
+        Endless write loop that drains the send queue, one frame at a time,
+        until the socket is closed.
+        """
+        try:
+            while True:
+                if self._send_queue_depth() == 0:
+                    self._send_await = asyncio.Future(loop=self._loop)
+                    await self._send_await
+                    self._send_await = None
+
+                    if self._batch and self._batch_window:
+                        await asyncio.sleep(self._batch_window,
+                                            loop=self._loop)
+
+                data, packet_count = self._take_frame()
+                self._frames_sent += 1
+                self._packets_sent += packet_count
+                self._packets_per_frame[packet_count] += 1
+
+                decoded = data
+                started = time.perf_counter()
+                data = await self._encode(data)
+                seconds = time.perf_counter() - started
+                self.metrics.frame_sent(len(data), len(decoded), seconds)
+                if self._compression_controller is not None:
+                    self._compression_controller.record(decoded, len(data),
+                                                        seconds)
+                self._bytes_in_flight = len(data)
+                self._wake_send_waiters()
+                await self._socket.send(data)
+                self._bytes_in_flight = 0
+        except (asyncio.CancelledError, websockets.ConnectionClosed):
+            pass  # the socket is closing
+        except Exception as e:
+            logger.error("error in interactive write loop", exc_info=True)
+            self._writer_died(e)
+        finally:
+            self._bytes_in_flight = 0
+            self._wake_send_waiters()
+
+    def _writer_died(self, error):
+        """
+        Drops the send queue once the write loop has stopped on an
+        unexpected error, and fails every call waiting for a reply with a
+        WriterDiedError, since their replies may never come. Packets sent
+        after this raise a WriterDiedError rather than waiting in the queue.
+        """
+        self._writer_error = error
+        self._send_queue.clear()
+        self._priority_send_queue.clear()
+        self._send_queue_bytes = 0
+
+        awaiting = self._awaiting_replies
+        self._awaiting_replies = {}
+        for future, _, _ in awaiting.values():
+            if not future.done():
+                died = WriterDiedError()
+                died.__cause__ = error
+                future.set_exception(died)
+
+    def _wake_send_waiters(self):
+        for waiter in self._send_waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+        self._send_waiters.clear()
+
+    async def _wait_for_writer(self, predicate):
+        """
+        Waits until the predicate returns False, re-checking it each time
+        the writer takes a frame off the send queue. Returns immediately if
+        the writer is not running.
+        """
+        while predicate():
+            if self._send_task is None or self._send_task.done():
+                return
+
+            waiter = asyncio.Future(loop=self._loop)
+            self._send_waiters.append(waiter)
+            await waiter
+
+    async def flush(self):
+        """
+        Waits until all queued packets have been written to the socket.
+        """
+        await self._wait_for_writer(
+            lambda: self._send_queue_depth() > 0 or self._bytes_in_flight > 0)
+
+    @property
+    def recv_queue_depth(self):
+        """
+        The number of received packets waiting to be read with
+        :func:`get_packet`.
+
+        :rtype: int
+        """
+        return len(self._recv_queue)
+
+    @property
+    def send_queue_depth(self):
+        """
+        The number of entries waiting in the send queue. Packets sent
+        together by :func:`call_many` count as a single entry.
+
+        :rtype: int
+        """
+        return self._send_queue_depth()
+
+    @property
+    def send_queue_bytes(self):
+        """
+        The number of bytes of JSON waiting in the send queue.
+
+        :rtype: int
+        """
+        return self._send_queue_bytes
+
+    @property
+    def bytes_in_flight(self):
+        """
+        The size of the encoded frame currently being written to the socket,
+        or zero if the writer is idle. A value which stays above zero
+        indicates that the socket has stalled.
+
+        :rtype: int
+        """
+        return self._bytes_in_flight
+
+    def metrics_snapshot(self):
+        """
+        Returns a dict of metrics describing the connection. Per-method call
+        counts, errors, timeouts and reply latencies (in seconds) are listed
+        under ``methods``. The rest are totals for the connection::
+
+            {
+                'methods': {
+                    'updateControls': {
+                        'calls': 120, 'timeouts': 0, 'errors': 1,
+                        'latency': {'count': 119, 'mean': 0.021,
+                                    'p50': 0.019, 'p95': 0.038,
+                                    'p99': 0.045},
+                    },
+                },
+                'frames_in': 4032,
+                'bytes_in': 160403,
+                'bytes_in_decoded': 961033,
+                'compression_ratio_in': 5.99,
+                'frames_out': 121,
+                # ...and the same for outgoing frames
+                'recv_queue_depth': 0,
+                'awaiting_replies': 1,
+                'send_queue_depth': 0,
+                'send_queue_bytes': 0,
+                'bytes_in_flight': 0,
+                'batch': {...},  # see batch_stats
+                'frames_offloaded': 0,
+            }
+
+        :rtype: dict
+        """
+        snapshot = self.metrics.snapshot()
+        snapshot['recv_queue_depth'] = len(self._recv_queue)
+        snapshot['awaiting_replies'] = len(self._awaiting_replies)
+        snapshot['send_queue_depth'] = self._send_queue_depth()
+        snapshot['priority_queue_depth'] = len(self._priority_send_queue)
+        snapshot['send_queue_bytes'] = self._send_queue_bytes
+        snapshot['bytes_in_flight'] = self._bytes_in_flight
+        snapshot['batch'] = self.batch_stats
+        snapshot['frames_offloaded'] = self._frames_offloaded
+        return snapshot
+
+    def _report_metrics(self):
+        try:
+            self._metrics_callback(self.metrics_snapshot())
+        except Exception:
+            logger.exception("error in interactive metrics callback")
+        finally:
+            self._metrics_timer = self._loop.call_later(
+                self._metrics_interval, self._report_metrics)
+
+    @property
+    def batch_stats(self):
+        """
+        Counters describing how outgoing packets were merged into frames.
+        ``packets_per_frame`` maps a number of packets to the number of frames
+        which were sent containing that many packets. ``dropped`` is the
+        number of discardable packets dropped because the send queue was full.
+
+        :rtype: dict
+        """
+        return {
+            'frames': self._frames_sent,
+            'packets': self._packets_sent,
+            'packets_per_frame': dict(self._packets_per_frame),
+            'dropped': self._packets_dropped,
+        }
+
+    async def _read_frame(self):
+        """
+        Reads and decodes a single frame off the websocket.
         """
         try:
             raw_data = await self._socket.recv()
@@ -187,7 +861,23 @@ class Connection:
             self._recv_await.set_result(False)
             raise e
 
-        return json.loads(self._decode(raw_data))
+        started = time.perf_counter()
+        data = await self._decode(raw_data)
+        seconds = time.perf_counter() - started
+        self.metrics.frame_received(len(raw_data), len(data), seconds)
+        if self._recorder is not None:
+            self._recorder.write(data)
+        if self._compression_controller is not None:
+            self._compression_controller.record(data, len(raw_data), seconds)
+
+        return data
+
+    async def _read_single(self):
+        """
+        Reads a single event off the websocket.
+        """
+        frame = await self._read_frame()
+        return self._codec_for(frame).loads(frame)
 
     async def _read(self):
         """
@@ -195,19 +885,13 @@ class Connection:
         """
         while True:
             try:
-                data = await self._read_single()
+                self._handle_frame(await self._read_frame())
             except (asyncio.CancelledError, websockets.ConnectionClosed):
                 break  # will already be handled
             except Exception as e:
                 logger.error("error in interactive read loop", extra=e)
                 break
 
-            if isinstance(data, list):
-                for item in data:
-                    self._handle_recv(item)
-            else:
-                self._handle_recv(data)
-
     async def set_compression(self, scheme):
         """Updates the compression used on the websocket this should be
         called with an instance of the Encoding class, for example::
@@ -225,7 +909,7 @@ class Connection:
         """
         result = await self.call("setCompression", {'scheme': [scheme.name()]})
         if result['scheme'] == scheme.name():
-            self._encoding = scheme
+            self._use_encoding(scheme)
             return True
 
         return False
@@ -245,11 +929,76 @@ class Connection:
         if result is not None:
             packet['result'] = result
         if error is not None:
-            packet['error'] = result
+            packet['error'] = error
+
+        self._send(packet, priority=True)
+
+    def _await_replies(self, packets, timeout):
+        """
+        Registers futures to be resolved with the replies to the given method
+        packets. If a timeout is given, all of them share a single deadline
+        after which any that are still awaiting a reply fail with an
+        asyncio.TimeoutError.
+
+        :rtype: List[asyncio.Future]
+        """
+        now = self._loop.time()
+        futures = []
+        call_ids = []
+        for packet in packets:
+            future = asyncio.Future(loop=self._loop)
+            self._awaiting_replies[packet['id']] = \
+                (future, packet['method'], now)
+            futures.append(future)
+            call_ids.append(packet['id'])
+
+        if timeout is not None:
+            deadline = now + timeout
+            heapq.heappush(self._reply_deadlines,
+                           (deadline, call_ids[0], call_ids))
+            if self._reply_deadlines[0][1] == call_ids[0]:
+                self._schedule_reply_timer()
+
+        return futures
+
+    def _schedule_reply_timer(self):
+        """
+        Sets the reply timer to fire at the earliest pending deadline.
+        """
+        if self._reply_timer is not None:
+            self._reply_timer.cancel()
+            self._reply_timer = None
+
+        if len(self._reply_deadlines) > 0:
+            self._reply_timer = self._loop.call_at(
+                self._reply_deadlines[0][0], self._expire_replies)
+
+    def _expire_replies(self):
+        """
+        Fails every call whose deadline has passed with an
+        asyncio.TimeoutError. Deadlines of calls which have already been
+        replied to are simply discarded.
+        """
+        self._reply_timer = None
+        now = self._loop.time()
+        deadlines = self._reply_deadlines
+
+        while len(deadlines) > 0 and deadlines[0][0] <= now:
+            _, _, call_ids = heapq.heappop(deadlines)
+            for call_id in call_ids:
+                awaiting = self._awaiting_replies.pop(call_id, None)
+                if awaiting is None:
+                    continue
 
-        self._send(packet)
+                future, method, _ = awaiting
+                self.metrics.methods[method].timeouts += 1
+                if not future.done():
+                    future.set_exception(asyncio.TimeoutError())
 
-    async def call(self, method, params, discard=False, timeout=10):
+        self._schedule_reply_timer()
+
+    async def call(self, method, params, discard=False, timeout=10,
+                   priority=False):
         """
         Sends a method call to the interactive socket. If discard
         is false, we'll wait for a response before returning, up to the
@@ -263,10 +1012,16 @@ class Connection:
         :type discard: bool
         :param timeout: Call timeout duration, in seconds.
         :type timeout: int
+        :param priority: ``True`` to send the call in the priority lane.
+        :type priority: bool
         :return: The call response, or None if it was discarded.
-        :raises: asyncio.TimeoutError
+        :raises: asyncio.TimeoutError, CallError, SendQueueFullError,
+            WriterDiedError
         """
 
+        if self._send_overflow == 'block':
+            await self._wait_for_writer(self._send_queue_full)
+
         packet = {
             'type': 'method',
             'method': method,
@@ -279,20 +1034,122 @@ class Connection:
             packet['discard'] = True
 
         self._call_counter += 1
-        self._send(packet)
+        self._send(packet, discardable=discard, priority=priority)
+        self.metrics.methods[method].calls += 1
 
         if discard:
             return None
 
-        future = asyncio.Future(loop=self._loop)
-        self._awaiting_replies[packet['id']] = future
+        future = self._await_replies([packet], timeout)[0]
 
         try:
-            return await asyncio.wait_for(future, timeout, loop=self._loop)
+            return await future
         except Exception as e:
-            del self._awaiting_replies[packet['id']]
+            self._awaiting_replies.pop(packet['id'], None)
             raise e
 
+    async def call_many(self, calls, discard=False, timeout=10,
+                        priority=False):
+        """
+        Sends several method calls to the interactive socket in a single
+        frame, and waits for all of their replies. The calls share a
+        single deadline of ``timeout`` seconds, rather than each getting
+        their own. Example::
+
+            results = await connection.call_many([
+                ('updateControls', {'sceneID': 'red', 'controls': red}),
+                ('updateControls', {'sceneID': 'blue', 'controls': blue}),
+            ])
+
+        Results are returned in the same order as the calls. If any call
+        fails, its place in the list holds the exception instead: a
+        :class:`~interactive_python.CallError` if the service replied with
+        an error, or an asyncio.TimeoutError if no reply arrived in time.
+
+        :param calls: List of (method, params) tuples to call
+        :type calls: List[Tuple[str, object]]
+        :param discard: ``True`` to not request any replies to the methods.
+        :type discard: bool
+        :param timeout: Deadline for all replies, in seconds.
+        :type timeout: int
+        :param priority: ``True`` to send the calls in the priority lane.
+        :type priority: bool
+        :return: The call responses, or None if they were discarded.
+        :rtype: list
+        :raises: SendQueueFullError, WriterDiedError
+        """
+
+        if len(calls) == 0:
+            return None if discard else []
+
+        if self._send_overflow == 'block':
+            await self._wait_for_writer(self._send_queue_full)
+
+        packets = []
+        for method, params in calls:
+            packet = {
+                'type': 'method',
+                'method': method,
+                'params': params,
+                'id': self._call_counter + len(packets),
+                'seq': self._last_sequence_number,
+            }
+
+            if discard:
+                packet['discard'] = True
+
+            packets.append(packet)
+
+        self._send_many(packets, discardable=discard, priority=priority)
+        self._call_counter += len(packets)
+        for method, _ in calls:
+            self.metrics.methods[method].calls += 1
+
+        if discard:
+            return None
+
+        futures = self._await_replies(packets, timeout)
+
+        try:
+            await asyncio.wait(futures, loop=self._loop)
+        finally:
+            for packet, future in zip(packets, futures):
+                if not future.done():
+                    future.cancel()
+                    del self._awaiting_replies[packet['id']]
+
+        results = []
+        for future in futures:
+            if future.exception() is not None:
+                results.append(future.exception())
+            else:
+                results.append(future.result())
+
+        return results
+
+    def ignore(self, *methods):
+        """
+        Drops incoming calls of the given methods as soon as they're
+        received, without parsing them or queueing them. For example, to
+        ignore participant updates::
+
+            connection.ignore('onParticipantUpdate')
+
+        :param methods: Method names to ignore
+        :type methods: str
+        """
+        self._ignored_methods.update(methods)
+
+    @property
+    def packets_ignored(self):
+        """
+        The number of incoming calls which were dropped because their
+        method was ignored.
+
+        :rtype: int
+        """
+        return self._packets_ignored
+
     def get_packet(self):
         """
         Synchronously reads a packet from the connection. Returns None if
@@ -326,7 +1183,27 @@ class Connection:
 
         return await self._recv_await
 
-    async def close(self):
-        """Closes the socket connection gracefully"""
+    async def close(self, timeout=10):
+        """
+        Closes the socket connection gracefully, waiting up to ``timeout``
+        seconds for queued packets to be written first. If the socket has
+        stalled, whatever is left in the queue is dropped and the socket is
+        closed anyway. If the timeout is None, we'll wait forever.
+
+        :param timeout: how long to wait for the queue to be written
+        :type timeout: float
+        """
+        try:
+            await asyncio.wait_for(self.flush(), timeout, loop=self._loop)
+        except asyncio.TimeoutError:
+            logger.warning('closing with {} packets still queued'.format(
+                self._send_queue_depth()))
+        if self._reply_timer is not None:
+            self._reply_timer.cancel()
+        if self._metrics_timer is not None:
+            self._metrics_timer.cancel()
+        self._send_task.cancel()
         self._recv_task.cancel()
         await self._socket.close()
+        if self._recorder is not None:
+            self._recorder.close()
@@ -0,0 +1,141 @@
+"""
+Builds preset dictionaries for the
+:class:`~interactive_python.PresetDictionaryEncoding`. You can build one from
+recorded traffic, with one JSON frame per line, by running::
+
+    python -m interactive_python.dictionary frames.txt > protocol.dict
+
+and then load it into the encoding on both ends of the connection::
+
+    with open('protocol.dict', 'rb') as f:
+        encoding = PresetDictionaryEncoding(dictionary=f.read())
+"""
+
+import argparse
+import collections
+import re
+import sys
+
+# Matches an object key along with a short scalar value, or the start of an
+# object or array, which follows it. These are the fragments that repeat
+# across Interactive messages. Keys are also counted on their own, since
+# their values often vary.
+_fragment_re = re.compile(r'"[^"\\]{0,48}"\s*:\s*'
+                          r'(?:"[^"\\]{0,48}"|-?\d{1,12}|true|false|null|'
+                          r'[\[{])?')
+_key_re = re.compile(r'"[^"\\]{1,48}"\s*:')
+
+
+def build_dictionary(frames, size=32 * 1024, min_count=2):
+    """
+    Builds a zlib preset dictionary out of the JSON fragments which occur
+    most often in the given frames. Fragments are scored by the number of
+    bytes they'd save, and the highest scoring ones are placed at the end of
+    the dictionary, where zlib can reference them most cheaply.
+
+    :param frames: JSON frames to build the dictionary from
+    :type frames: Iterable[str]
+    :param size: maximum size of the dictionary in bytes, at most 32 KB
+    :type size: int
+    :param min_count: ignore fragments seen fewer times than this
+    :type min_count: int
+    :rtype: bytes
+    """
+    counts = collections.Counter()
+    for frame in frames:
+        if isinstance(frame, bytes):
+            frame = frame.decode('utf-8')
+        counts.update(_fragment_re.findall(frame))
+        counts.update(_key_re.findall(frame))
+
+    scored = sorted(((count * len(fragment), fragment)
+                     for fragment, count in counts.items()
+                     if count >= min_count), reverse=True)
+
+    chosen = []
+    length = 0
+    for _, fragment in scored:
+        encoded = fragment.encode('utf-8')
+        if length + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        length += len(encoded)
+
+    return b''.join(reversed(chosen))
+
+
+_sample_traffic = [
+    '{"type":"method","method":"hello","params":{},"seq":1}',
+    '{"type":"method","id":0,"method":"setCompression","params":'
+    '{"scheme":["gzip","text"]},"seq":0}',
+    '{"type":"reply","result":{"scheme":"gzip"},"error":null,"id":0,"seq":2}',
+    '{"type":"reply","result":null,"error":{"code":4000,"message":"",'
+    '"path":""},"id":1,"seq":3}',
+    '{"type":"method","id":1,"method":"ready","params":{"isReady":true},'
+    '"seq":2}',
+    '{"type":"method","method":"giveInput","params":{"participantID":"",'
+    '"input":{"controlID":"","event":"mousedown","button":0}},"seq":4}',
+    '{"type":"method","method":"giveInput","params":{"participantID":"",'
+    '"input":{"controlID":"","event":"mouseup","button":0}},"seq":5}',
+    '{"type":"method","method":"giveInput","params":{"participantID":"",'
+    '"transactionID":"","input":{"controlID":"","event":"move","x":0,'
+    '"y":0}},"seq":6}',
+    '{"type":"method","method":"onParticipantJoin","params":{"participants":'
+    '[{"sessionID":"","userID":0,"username":"","level":1,"lastInputAt":0,'
+    '"connectedAt":0,"disabled":false,"groupID":"default","meta":{},'
+    '"etag":""}]},"seq":7}',
+    '{"type":"method","method":"onParticipantUpdate","params":'
+    '{"participants":[{"sessionID":"","userID":0,"username":"","level":1,'
+    '"lastInputAt":0,"connectedAt":0,"disabled":false,"groupID":"default",'
+    '"meta":{},"etag":""}]},"seq":8}',
+    '{"type":"method","method":"onParticipantLeave","params":{"participants":'
+    '[{"sessionID":"","userID":0,"username":"","groupID":"default"}]},'
+    '"seq":9}',
+    '{"type":"method","method":"onSceneCreate","params":{"scenes":'
+    '[{"sceneID":"default","controls":[],"meta":{},"etag":""}]},"seq":10}',
+    '{"type":"method","method":"onControlUpdate","params":{"sceneID":'
+    '"default","controls":[{"controlID":"","kind":"button","text":"",'
+    '"cost":0,"progress":0,"cooldown":0,"disabled":false,"keycode":0,'
+    '"meta":{},"etag":"","position":[{"size":"large","width":5,"height":5,'
+    '"x":0,"y":0},{"size":"medium","width":5,"height":5,"x":0,"y":0},'
+    '{"size":"small","width":5,"height":5,"x":0,"y":0}]}]},"seq":11}',
+    '{"type":"method","method":"onControlUpdate","params":{"sceneID":'
+    '"default","controls":[{"controlID":"","kind":"joystick",'
+    '"sampleRate":50,"angle":0,"intensity":0,"meta":{},"etag":""}]},'
+    '"seq":12}',
+    '{"type":"method","method":"onGroupUpdate","params":{"groups":'
+    '[{"groupID":"default","sceneID":"default","meta":{},"etag":""}]},'
+    '"seq":13}',
+    '{"type":"method","id":2,"method":"updateControls","params":{"sceneID":'
+    '"default","controls":[{"controlID":"","cooldown":0,"disabled":false,'
+    '"progress":0,"text":""}]},"seq":14}',
+    '{"type":"method","id":3,"method":"updateParticipants","params":'
+    '{"participants":[{"sessionID":"","groupID":"default","etag":""}]},'
+    '"seq":15}',
+    '{"type":"method","id":4,"method":"updateGroups","params":{"groups":'
+    '[{"groupID":"default","sceneID":"default","etag":""}]},"seq":16}',
+    '{"type":"method","id":5,"method":"capture","params":'
+    '{"transactionID":""},"seq":17}',
+]
+
+default_dictionary = build_dictionary(_sample_traffic, min_count=1)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Builds a preset dictionary from recorded frames.')
+    parser.add_argument('files', nargs='+', type=argparse.FileType('r'),
+                        help='files containing one JSON frame per line')
+    parser.add_argument('--size', type=int, default=32 * 1024,
+                        help='maximum dictionary size in bytes')
+    parser.add_argument('--min-count', type=int, default=2,
+                        help='ignore fragments seen fewer times than this')
+    args = parser.parse_args(args)
+
+    frames = (line for f in args.files for line in f if line.strip())
+    sys.stdout.buffer.write(build_dictionary(frames, size=args.size,
+                                             min_count=args.min_count))
+
+
+if __name__ == '__main__':
+    main()
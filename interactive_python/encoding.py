@@ -1,9 +1,9 @@
 from abc import abstractmethod
-from gzip import GzipFile
-import varint
-import io
 import zlib
 
+from .codec import MessagePackCodec
+from .dictionary import default_dictionary
+
 
 class EncodingException(Exception):
     """An EncodingException is raised if an error occurs in an encoding or
@@ -35,21 +35,50 @@ class Encoding:
         returns it decoded, string form """
         pass
 
+    def decode_bytes(self, data):
+        """ decode_bytes is like decode, but returns the decoded data as
+        UTF-8 bytes. Encodings which decode to bytes should override this
+        so that codecs can parse their output without an extra copy. """
+        return self.decode(data).encode('utf-8')
+
+    def codec(self):
+        """ codec returns the Codec which packets must be serialized with
+        while this encoding is in use, or None if the encoding works on the
+        JSON text produced by the connection's own codec. """
+        return None
 
-def reset_buffer(buffer, value=None):
-    buffer.truncate(0)
-    buffer.seek(0)
 
-    if value is not None:
-        buffer.write(value)
+def encode_varint(value):
+    """
+    Returns the unsigned varint encoding of the value.
+    :type value: int
+    :rtype: bytes
+    """
+    output = bytearray()
+    while value > 0x7f:
+        output.append((value & 0x7f) | 0x80)
+        value >>= 7
+    output.append(value)
 
+    return bytes(output)
 
-def reset_buffer(buffer, value=None):
-    buffer.truncate(0)
-    buffer.seek(0)
 
-    if value is not None:
-        buffer.write(value)
+def decode_varint(data):
+    """
+    Reads an unsigned varint off the start of the data. Returns the value
+    and the number of bytes it took up.
+    :type data: bytes
+    :rtype: Tuple[int, int]
+    """
+    value = 0
+    shift = 0
+    for i, byte in enumerate(data):
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, i + 1
+        shift += 7
+
+    raise EncodingException('Unterminated varint')
 
 
 class TextEncoding(Encoding):
@@ -63,48 +92,126 @@ class TextEncoding(Encoding):
     def decode(self, data):
         return data
 
+    def decode_bytes(self, data):
+        return data
 
-class GzipEncoding(Encoding):
-    def __init__(self, compression_level=6):
+
+class StreamEncoding(Encoding):
+    """StreamEncoding is the base for encodings which compress messages into
+    a single deflate stream that lasts for the lifetime of the connection.
+    Each message is prefixed with the varint length of its uncompressed data
+    and ends with a sync flush, so that it can be decompressed as soon as
+    it's received.
+    """
+
+    def __init__(self, encoder, decoder):
+        """
+        :param encoder: the zlib compression object to encode with
+        :param decoder: the zlib decompression object to decode with
+        """
         super()
-        self._encoder_buffer = io.BytesIO()
-        self._encoder = None
-        self._decoder_buffer = io.BytesIO()
-        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
-        self._compression_level = compression_level
+        self._encoder = encoder
+        self._decoder = decoder
+        self._decoder_tail = b''
+
+    def encode(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        return b''.join((
+            encode_varint(len(data)),
+            self._encoder.compress(data),
+            self._encoder.flush(zlib.Z_SYNC_FLUSH),
+        ))
+
+    def decode(self, data):
+        return self.decode_bytes(data).decode('utf-8')
+
+    def decode_bytes(self, data):
+        # Read the varuint prefix off the data, then decompress the rest
+        # in place. Any input left over once we've got the full message is
+        # kept and prepended to the next one.
+        length, offset = decode_varint(data)
+        compressed = memoryview(data)[offset:]
+        if self._decoder_tail:
+            compressed = self._decoder_tail + compressed
+
+        decoded_data = self._decoder.decompress(compressed, length)
+        self._decoder_tail = self._decoder.unconsumed_tail
+
+        return decoded_data
+
+
+class GzipEncoding(StreamEncoding):
+    """GzipEncoding compresses messages into a gzip stream. It's supported
+    by the Interactive service.
+    """
+
+    def __init__(self, compression_level=6):
+        super().__init__(
+            zlib.compressobj(compression_level, zlib.DEFLATED,
+                             16 + zlib.MAX_WBITS),
+            zlib.decompressobj(16 + zlib.MAX_WBITS))
 
     def name(self):
         return 'gzip'
 
-    def encode(self, data):
-        data = data.encode('utf-8')
-        self._encoder_buffer.write(varint.encode(len(data)))
 
-        # Don't initialize the encoder before the first call to encode(), since
-        # it writes the gzip header immediately and we need to insert the
-        # message length prior to that happening.
-        if self._encoder is None:
-            self._encoder = GzipFile(fileobj=self._encoder_buffer, mode='wb',
-                                     compresslevel=self._compression_level)
+class PresetDictionaryEncoding(StreamEncoding):
+    """PresetDictionaryEncoding compresses messages into a raw deflate
+    stream primed with a preset dictionary of common protocol strings, so
+    that even the first, small messages on a connection compress well. Both
+    ends must use the same dictionary. A dictionary tuned to your own
+    traffic can be built with :func:`~interactive_python.build_dictionary`.
+
+    This scheme is not offered by the Interactive service itself; it's for
+    use with servers or proxies which implement it under the same name.
+    """
 
-        self._encoder.write(data)
-        self._encoder.flush()
+    def __init__(self, dictionary=None, compression_level=6,
+                 name='deflate-dict'):
+        if dictionary is None:
+            dictionary = default_dictionary
 
-        output = self._encoder_buffer.getvalue()
-        reset_buffer(self._encoder_buffer)
+        super().__init__(
+            zlib.compressobj(compression_level, zlib.DEFLATED,
+                             -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                             zlib.Z_DEFAULT_STRATEGY, dictionary),
+            zlib.decompressobj(-zlib.MAX_WBITS, dictionary))
+        self._name = name
 
-        return output
+    def name(self):
+        return self._name
+
+
+class MessagePackEncoding(Encoding):
+    """MessagePackEncoding exchanges packets serialized as MessagePack
+    rather than JSON, which is both smaller and quicker to parse. It needs
+    the msgpack library to be installed. While it's in use, packets are
+    serialized by a :class:`~interactive_python.MessagePackCodec` instead of
+    the connection's codec.
+
+    Interactive itself only speaks JSON, so the "msgpack" scheme will only
+    be agreed to by a server or proxy which translates it, and
+    :func:`~interactive_python.Connection.set_compression` stays on text
+    otherwise.
+    """
+
+    def __init__(self, name='msgpack'):
+        self._codec = MessagePackCodec()
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def encode(self, data):
+        return data
 
     def decode(self, data):
-        # Decode the varuint prefix off the data first, then smash the remaining
-        # data into the decode buffer and reset it to read any previous tail.
-        prefix_stream = io.BytesIO(data)
-        decoded_bytes = varint.decode_stream(prefix_stream)
-        self._decoder_buffer.write(data[prefix_stream.tell():])
-        self._decoder_buffer.seek(0)
-
-        decoded_data = self._decoder.decompress(
-            self._decoder_buffer.getbuffer(), decoded_bytes)
-        reset_buffer(self._decoder_buffer, self._decoder.unconsumed_tail)
-
-        return decoded_data.decode('utf-8')
+        return data
+
+    def decode_bytes(self, data):
+        return data
+
+    def codec(self):
+        return self._codec
@@ -32,3 +32,43 @@ class ShortCodeAccessDeniedError(ShortCodeError):
 class ShortCodeTimeoutError(ShortCodeError):
     """Exception raised when the shortcode expires without being accepted."""
     pass
+
+
+class SendQueueFullError(Exception):
+    """Raised when a packet is sent while the Connection's send queue is full
+    and its overflow policy does not allow the packet to be queued."""
+    pass
+
+
+class WriterDiedError(Exception):
+    """Raised when a packet is sent after the Connection's write loop has
+    stopped on an unexpected error, and by calls which were waiting for a
+    reply when it stopped. The error it stopped on is its ``__cause__``."""
+    pass
+
+
+class CallError(Exception):
+    """Raised when the Interactive service replies to a method call with an
+    error. The error sent by the service is available in ``error``."""
+
+    def __init__(self, error):
+        super(CallError, self).__init__(error)
+        self.error = error
+
+
+class InputHandlerError(Exception):
+    """Emitted as an ``inputError`` event on the State when the handler given
+    to :func:`State.shard_input` raises. The giveInput params it was called
+    with are available in ``data``, and the worker's formatted traceback in
+    ``traceback``."""
+
+    def __init__(self, message, data, traceback):
+        super(InputHandlerError, self).__init__(message, data, traceback)
+        self.data = data
+        self.traceback = traceback
+
+
+class ShardWorkerDiedError(Exception):
+    """Raised when input is sent to a worker process started by
+    :func:`State.shard_input` which has exited."""
+    pass
@@ -0,0 +1,197 @@
+from array import array
+import math
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class JoystickAggregator:
+    """
+    JoystickAggregator keeps the latest position of every participant's
+    stick on a joystick, so that a game can read the crowd's aggregate
+    direction once per frame rather than handling every move. Create one
+    with :func:`Joystick.aggregate`::
+
+        sticks = joystick.aggregate(ttl=1)
+
+        def tick():
+            direction = sticks.mean()
+            if direction is not None:
+                steer(*direction)
+
+    Each participant is given a slot in preallocated, contiguous arrays of
+    x and y positions, update times and weights, which grow as needed.
+    Sticks which haven't moved in ``ttl`` seconds are stale, and are left
+    out of every query; their slots are reused once the arrays are full.
+
+    If numpy is installed, queries run over all the slots at once in numpy,
+    without copying the arrays. Otherwise they fall back to plain Python.
+    """
+
+    def __init__(self, capacity=1024, ttl=1.0, clock=time.monotonic):
+        self._ttl = ttl
+        self._clock = clock
+        self._x = array('d', bytes(8 * capacity))
+        self._y = array('d', bytes(8 * capacity))
+        self._weight = array('d', [1.0]) * capacity
+        self._updated = array('d', [-math.inf]) * capacity
+        self._slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _slot(self, participant_id):
+        slot = self._slots.get(participant_id)
+        if slot is not None:
+            return slot
+
+        if not self._free:
+            self.expire()
+        if not self._free:
+            self._grow()
+
+        slot = self._free.pop()
+        self._slots[participant_id] = slot
+        return slot
+
+    def _grow(self):
+        capacity = len(self._x)
+        self._x.extend(array('d', bytes(8 * capacity)))
+        self._y.extend(array('d', bytes(8 * capacity)))
+        self._weight.extend(array('d', [1.0]) * capacity)
+        self._updated.extend(array('d', [-math.inf]) * capacity)
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _record(self, participant_id, x, y):
+        """
+        Stores a participant's stick position. Called by the joystick.
+        """
+        slot = self._slots.get(participant_id)
+        if slot is None:
+            slot = self._slot(participant_id)
+        self._x[slot] = x
+        self._y[slot] = y
+        self._updated[slot] = self._clock()
+
+    def set_weight(self, participant_id, weight):
+        """
+        Sets how much the participant's stick counts towards
+        :func:`weighted_mean`. Weights default to 1.
+        :type weight: float
+        """
+        self._weight[self._slot(participant_id)] = weight
+
+    def expire(self):
+        """
+        Frees the slots of stale sticks. This is done automatically when the
+        arrays fill up.
+        """
+        cutoff = self._clock() - self._ttl
+        for participant_id, slot in list(self._slots.items()):
+            if self._updated[slot] < cutoff:
+                del self._slots[participant_id]
+                self._updated[slot] = -math.inf
+                self._weight[slot] = 1.0
+                self._free.append(slot)
+
+    def _active(self):
+        """
+        Returns numpy views of the x, y and weight arrays, filtered down to
+        the sticks which aren't stale.
+        """
+        cutoff = self._clock() - self._ttl
+        mask = numpy.frombuffer(self._updated) >= cutoff
+        return (numpy.frombuffer(self._x)[mask],
+                numpy.frombuffer(self._y)[mask],
+                numpy.frombuffer(self._weight)[mask])
+
+    def _active_slots(self):
+        cutoff = self._clock() - self._ttl
+        updated = self._updated
+        return [slot for slot in self._slots.values()
+                if updated[slot] >= cutoff]
+
+    def count(self):
+        """
+        Returns the number of sticks which aren't stale.
+        :rtype: int
+        """
+        if numpy is not None:
+            cutoff = self._clock() - self._ttl
+            return int(numpy.count_nonzero(
+                numpy.frombuffer(self._updated) >= cutoff))
+
+        return len(self._active_slots())
+
+    def mean(self):
+        """
+        Returns the mean (x, y) position of the sticks which aren't stale,
+        or None if there are none.
+        :rtype: Tuple[float, float]
+        """
+        if numpy is not None:
+            x, y, _ = self._active()
+            if len(x) == 0:
+                return None
+            return float(x.mean()), float(y.mean())
+
+        slots = self._active_slots()
+        if not slots:
+            return None
+        return (sum(self._x[s] for s in slots) / len(slots),
+                sum(self._y[s] for s in slots) / len(slots))
+
+    def weighted_mean(self):
+        """
+        Returns the mean (x, y) position of the sticks which aren't stale,
+        weighted by the participants' weights, or None if there are none or
+        their weights add up to zero.
+        :rtype: Tuple[float, float]
+        """
+        if numpy is not None:
+            x, y, weight = self._active()
+            total = weight.sum()
+            if total == 0:
+                return None
+            return (float(numpy.dot(x, weight) / total),
+                    float(numpy.dot(y, weight) / total))
+
+        slots = self._active_slots()
+        total = sum(self._weight[s] for s in slots)
+        if total == 0:
+            return None
+        return (sum(self._x[s] * self._weight[s] for s in slots) / total,
+                sum(self._y[s] * self._weight[s] for s in slots) / total)
+
+    def histogram(self, bins=8, deadzone=0.1):
+        """
+        Counts the sticks which aren't stale by the direction they point
+        in. The circle is split into ``bins`` equal sectors, the first of
+        which is centered on the positive x axis, going towards positive y.
+        Sticks closer to the center than the ``deadzone`` aren't counted.
+        :type bins: int
+        :type deadzone: float
+        :rtype: List[int]
+        """
+        sector = 2 * math.pi / bins
+        if numpy is not None:
+            x, y, _ = self._active()
+            pointing = numpy.hypot(x, y) >= deadzone
+            angles = numpy.arctan2(y[pointing], x[pointing])
+            indexes = numpy.floor((angles + sector / 2) / sector) \
+                .astype(numpy.int64) % bins
+            return numpy.bincount(indexes, minlength=bins).tolist()
+
+        counts = [0] * bins
+        for slot in self._active_slots():
+            x, y = self._x[slot], self._y[slot]
+            if math.hypot(x, y) < deadzone:
+                continue
+            angle = math.atan2(y, x)
+            counts[int(math.floor((angle + sector / 2) / sector)) % bins] += 1
+
+        return counts
@@ -0,0 +1,140 @@
+from bisect import bisect_left
+import collections
+
+
+class LatencyHistogram:
+    """
+    LatencyHistogram counts durations into exponentially-sized buckets, four
+    per doubling from 100 microseconds up to a few minutes. Percentiles are
+    reported as the upper bound of the bucket they fall into, so they're
+    accurate to within about 20%.
+    """
+
+    __slots__ = ('_counts', 'count', 'total')
+
+    bounds = [0.0001 * 2 ** (i / 4) for i in range(84)]
+
+    def __init__(self):
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+
+    def record(self, duration):
+        """
+        Adds a duration, in seconds, to the histogram.
+        :type duration: float
+        """
+        self._counts[bisect_left(self.bounds, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+    def percentile(self, p):
+        """
+        Returns the duration, in seconds, which p percent of the recorded
+        durations fell under, or None if nothing has been recorded.
+        :type p: float
+        :rtype: float
+        """
+        if self.count == 0:
+            return None
+
+        target = self.count * p / 100
+        seen = 0
+        for i, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                break
+
+        return self.bounds[min(i, len(self.bounds) - 1)]
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class MethodMetrics:
+    """
+    MethodMetrics holds counters for calls of a single RPC method.
+    """
+
+    __slots__ = ('calls', 'timeouts', 'errors', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'latency': self.latency.snapshot(),
+        }
+
+
+class ConnectionMetrics:
+    """
+    ConnectionMetrics accumulates counters for a Connection. Byte counts are
+    taken both "raw", as they're sent over the socket, and "decoded", as
+    JSON before encoding. For text frames, the length is in characters.
+    The time spent encoding and decoding frames is also totalled.
+    """
+
+    def __init__(self):
+        self.methods = collections.defaultdict(MethodMetrics)
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.bytes_in_decoded = 0
+        self.decode_seconds = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.bytes_out_decoded = 0
+        self.encode_seconds = 0
+
+    def frame_received(self, raw_length, decoded_length, seconds=0):
+        self.frames_in += 1
+        self.bytes_in += raw_length
+        self.bytes_in_decoded += decoded_length
+        self.decode_seconds += seconds
+
+    def frame_sent(self, raw_length, decoded_length, seconds=0):
+        self.frames_out += 1
+        self.bytes_out += raw_length
+        self.bytes_out_decoded += decoded_length
+        self.encode_seconds += seconds
+
+    def snapshot(self):
+        """
+        Returns a dict of all the counters.
+        :rtype: dict
+        """
+        return {
+            'methods': {name: method.snapshot()
+                        for name, method in self.methods.items()},
+            'frames_in': self.frames_in,
+            'bytes_in': self.bytes_in,
+            'bytes_in_decoded': self.bytes_in_decoded,
+            'compression_ratio_in': _ratio(self.bytes_in_decoded,
+                                           self.bytes_in),
+            'decode_seconds': self.decode_seconds,
+            'frames_out': self.frames_out,
+            'bytes_out': self.bytes_out,
+            'bytes_out_decoded': self.bytes_out_decoded,
+            'compression_ratio_out': _ratio(self.bytes_out_decoded,
+                                            self.bytes_out),
+            'encode_seconds': self.encode_seconds,
+        }
+
+
+def _ratio(decoded, encoded):
+    if encoded == 0:
+        return None
+
+    return decoded / encoded
@@ -0,0 +1,183 @@
+import sys
+
+
+class Participant:
+    """
+    Participant is a compact record of a viewer connected to Interactive. The
+    State keeps one for each participant in its
+    :class:`~interactive_python.ParticipantRegistry`; they're updated in place
+    as changes come in, so shouldn't be modified directly.
+    """
+
+    __slots__ = ('session_id', 'user_id', 'username', 'level', 'group_id',
+                 'last_input_at', 'connected_at', 'disabled', 'etag', 'meta')
+
+    # Maps each slot to its property in the protocol.
+    fields = (
+        ('session_id', 'sessionID'),
+        ('user_id', 'userID'),
+        ('username', 'username'),
+        ('level', 'level'),
+        ('group_id', 'groupID'),
+        ('last_input_at', 'lastInputAt'),
+        ('connected_at', 'connectedAt'),
+        ('disabled', 'disabled'),
+        ('etag', 'etag'),
+        ('meta', 'meta'),
+    )
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.user_id = None
+        self.username = None
+        self.level = 0
+        self.group_id = 'default'
+        self.last_input_at = 0
+        self.connected_at = 0
+        self.disabled = False
+        self.etag = None
+        self.meta = None
+
+    def _apply(self, data):
+        """
+        Copies the properties present in a protocol participant onto the
+        record.
+        :type data: dict
+        """
+        get = data.get
+        self.user_id = get('userID', self.user_id)
+        self.username = get('username', self.username)
+        self.level = get('level', self.level)
+        self.group_id = get('groupID', self.group_id)
+        self.last_input_at = get('lastInputAt', self.last_input_at)
+        self.connected_at = get('connectedAt', self.connected_at)
+        self.disabled = get('disabled', self.disabled)
+        self.etag = get('etag', self.etag)
+        self.meta = get('meta', self.meta)
+
+    def to_json(self):
+        output = {}
+        for slot, prop in self.fields:
+            value = getattr(self, slot)
+            if value is not None:
+                output[prop] = value
+
+        return output
+
+    def __repr__(self):
+        return '<Participant {} {!r} in {!r}>'.format(
+            self.session_id, self.username, self.group_id)
+
+
+class ParticipantRegistry:
+    """
+    ParticipantRegistry keeps track of the participants connected to the
+    session, updating itself from "onParticipantJoin", "onParticipantUpdate"
+    and "onParticipantLeave" calls. It's available as the ``participants``
+    attribute of the State::
+
+        viewer = state.participants.get(session_id)
+        red_team = state.participants.in_group('red')
+
+    Participants can be looked up by session ID, user ID and group ID in
+    constant time. Each participant is stored once, as a slotted
+    :class:`~interactive_python.Participant`, and group IDs are interned so
+    that participants in the same group share the same string.
+    """
+
+    def __init__(self):
+        self._by_session = {}
+        self._by_user = {}
+        self._by_group = {}
+
+    def __len__(self):
+        return len(self._by_session)
+
+    def __iter__(self):
+        return iter(self._by_session.values())
+
+    def __contains__(self, session_id):
+        return session_id in self._by_session
+
+    def get(self, session_id):
+        """
+        Returns the participant with the session ID, or None.
+        :type session_id: str
+        :rtype: Participant
+        """
+        return self._by_session.get(session_id)
+
+    def by_user(self, user_id):
+        """
+        Returns the participant with the user ID, or None.
+        :type user_id: int
+        :rtype: Participant
+        """
+        return self._by_user.get(user_id)
+
+    def in_group(self, group_id):
+        """
+        Returns the participants in the group.
+        :type group_id: str
+        :rtype: List[Participant]
+        """
+        return list(self._by_group.get(group_id, {}).values())
+
+    def group_size(self, group_id):
+        """
+        Returns the number of participants in the group.
+        :type group_id: str
+        :rtype: int
+        """
+        return len(self._by_group.get(group_id, ()))
+
+    def groups(self):
+        """
+        Returns the IDs of the groups which have participants in them.
+        :rtype: List[str]
+        """
+        return list(self._by_group.keys())
+
+    def _index(self, participant):
+        if participant.user_id is not None:
+            self._by_user[participant.user_id] = participant
+
+        group_id = participant.group_id = sys.intern(participant.group_id)
+        members = self._by_group.get(group_id)
+        if members is None:
+            members = self._by_group[group_id] = {}
+        members[participant.session_id] = participant
+
+    def _unindex(self, participant):
+        if self._by_user.get(participant.user_id) is participant:
+            del self._by_user[participant.user_id]
+
+        members = self._by_group.get(participant.group_id)
+        if members is not None:
+            members.pop(participant.session_id, None)
+            if not members:
+                del self._by_group[participant.group_id]
+
+    def _upsert(self, data):
+        participant = self._by_session.get(data['sessionID'])
+        if participant is None:
+            participant = Participant(data['sessionID'])
+            self._by_session[participant.session_id] = participant
+        else:
+            self._unindex(participant)
+
+        participant._apply(data)
+        self._index(participant)
+
+    def _remove(self, data):
+        participant = self._by_session.pop(data['sessionID'], None)
+        if participant is not None:
+            self._unindex(participant)
+
+    def _on_join_or_update(self, call):
+        for data in call.data['participants']:
+            self._upsert(data)
+
+    def _on_leave(self, call):
+        for data in call.data['participants']:
+            self._remove(data)
@@ -0,0 +1,187 @@
+import asyncio
+import time
+
+from .encoding import EncodingException, decode_varint, encode_varint
+
+_magic = b'IPREC\x01'
+
+
+class FrameRecorder:
+    """
+    FrameRecorder appends the frames a Connection receives to a compact
+    binary log, so that real traffic can be replayed later with a
+    :class:`~interactive_python.ReplaySocket`. Pass a path, or a file
+    opened in binary append mode, as the Connection's ``record``::
+
+        connection = Connection(..., record='session.iprec')
+
+    Frames are recorded after any compression (permessage-deflate or a
+    :class:`~interactive_python.GzipEncoding`) has been undone, so a
+    recording can be replayed into any Connection.
+
+    The log is a short header followed by one record per frame: the
+    microseconds since the previous frame, measured on a monotonic clock,
+    and the frame's length and type as varints, then the frame itself.
+    """
+
+    def __init__(self, file, clock=time.monotonic):
+        """
+        :param file: the path to append to, or a binary file object
+        :type file: Union[str, BinaryIO]
+        """
+        self._owns_file = isinstance(file, str)
+        self._file = open(file, 'ab') if self._owns_file else file
+        self._clock = clock
+        self._last = None
+        self.frames = 0
+
+        if self._file.tell() == 0:
+            self._file.write(_magic)
+
+    def write(self, frame):
+        """
+        Appends a frame to the log.
+        :type frame: Union[str, bytes]
+        """
+        now = self._clock()
+        delta = 0 if self._last is None else int((now - self._last) * 1e6)
+        self._last = now
+
+        if isinstance(frame, str):
+            payload = frame.encode('utf-8')
+            kind = 0
+        else:
+            payload = frame
+            kind = 1
+
+        self._file.write(b''.join((
+            encode_varint(max(delta, 0)),
+            encode_varint(len(payload) << 1 | kind),
+            payload,
+        )))
+        self.frames += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """
+        Flushes the log, and closes it if it was opened from a path.
+        """
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+
+
+def read_recording(file):
+    """
+    Reads a log written by a :class:`~interactive_python.FrameRecorder`.
+    Returns a list of (seconds since the first frame, frame) tuples. If the
+    last frame was cut off, for instance by a crash while it was being
+    written, it's left out.
+
+    :param file: the path to read, or a binary file object
+    :type file: Union[str, BinaryIO]
+    :rtype: List[Tuple[float, Union[str, bytes]]]
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            data = f.read()
+    else:
+        data = file.read()
+
+    if not data.startswith(_magic):
+        raise ValueError('Not a recording of Interactive frames')
+
+    view = memoryview(data)
+    frames = []
+    offset = len(_magic)
+    elapsed = 0
+    while offset < len(data):
+        try:
+            delta, size = decode_varint(view[offset:offset + 10])
+            offset += size
+            header, size = decode_varint(view[offset:offset + 10])
+            offset += size
+        except EncodingException:
+            break
+
+        end = offset + (header >> 1)
+        if end > len(data):
+            break
+        payload = data[offset:end]
+        offset = end
+
+        elapsed += delta
+        frame = payload if header & 1 else payload.decode('utf-8')
+        frames.append((elapsed / 1e6, frame))
+
+    return frames
+
+
+class ReplaySocket:
+    """
+    ReplaySocket plays a recording back into a Connection, standing in for
+    the websocket, to reproduce real traffic offline::
+
+        socket = ReplaySocket('session.iprec', speed=None, loop=loop)
+        state = State(Connection(socket=socket, loop=loop))
+        await state.connection.connect()
+        await socket.finished
+        state.pump()
+
+    With ``speed`` of 1, frames are received at the times they were
+    recorded. Larger speeds play the recording faster, and None plays it as
+    fast as the Connection can read it. Once every frame has been received,
+    the ``finished`` future is resolved with the number of frames, and
+    further reads wait until the socket is closed. Frames sent to the
+    socket are dropped, so calls won't get replies.
+    """
+
+    def __init__(self, recording, speed=1, loop=None):
+        """
+        :param recording: a path, binary file object, or the frames from
+            :func:`read_recording`
+        :type speed: float
+        :type loop: asyncio.AbstractEventLoop
+        """
+        if not isinstance(recording, list):
+            recording = read_recording(recording)
+
+        self._frames = recording
+        self._position = 0
+        self._speed = speed
+        self._loop = loop or asyncio.get_event_loop()
+        self._started = None
+        self._closed = asyncio.Future(loop=self._loop)
+        self.finished = asyncio.Future(loop=self._loop)
+        self.sent = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    async def recv(self):
+        if self._position >= len(self._frames):
+            if not self.finished.done():
+                self.finished.set_result(self._position)
+            await self._closed
+            raise asyncio.CancelledError()
+
+        at, frame = self._frames[self._position]
+        self._position += 1
+
+        if self._speed is not None:
+            if self._started is None:
+                self._started = self._loop.time() - at / self._speed
+            delay = self._started + at / self._speed - self._loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay, loop=self._loop)
+
+        return frame
+
+    async def send(self, data):
+        self.sent += 1
+
+    async def close(self):
+        if not self._closed.done():
+            self._closed.set_result(None)
@@ -1,4 +1,54 @@
 from ._util import Resource
+from .joystick import JoystickAggregator
+from .tally import VoteTally
+
+
+class ControlIndex:
+    """
+    ControlIndex maps control IDs to the controls in all of a State's
+    scenes, so that input can be routed to its control without searching
+    every scene. Control IDs are only unique within a scene; if several
+    scenes have a control with the same ID, the first one indexed is used
+    until it's removed.
+    """
+
+    def __init__(self, scenes):
+        """
+        :param scenes: the State's scenes, keyed by ID
+        :type scenes: Dict[str, Scene]
+        """
+        self._scenes = scenes
+        self._controls = {}
+
+    def get(self, control_id):
+        """
+        Returns the control with the given ID, or None.
+        :rtype: Control
+        """
+        return self._controls.get(control_id)
+
+    def add(self, control, replacing=None):
+        """
+        Indexes the control, unless a control with the same ID is already
+        indexed. If the control is replacing another in its scene, and that
+        one is indexed, it takes its place.
+        """
+        if replacing is not None and \
+                self._controls.get(control.id) is replacing:
+            self._controls[control.id] = control
+        else:
+            self._controls.setdefault(control.id, control)
+
+    def remove(self, control):
+        if self._controls.get(control.id) is not control:
+            return
+
+        del self._controls[control.id]
+        for scene in self._scenes.values():
+            other = scene.controls.get(control.id)
+            if other is not None and other is not control:
+                self._controls[control.id] = other
+                break
 
 
 class Scene(Resource):
@@ -17,6 +67,8 @@ class Scene(Resource):
         super(Scene, self).__init__(scene_id, id_property='sceneID')
         self.assign(**kwargs)
         self.controls = {}
+        self._index = None
+        self._tallies = []
         self._control_kinds = {
             'button': Button,
             'joystick': Joystick,
@@ -37,11 +89,13 @@ class Scene(Resource):
 
     async def update(self, priority=0):
         """
-        Saves all changes updates made to the scene.
+        Saves all changes updates made to the scene. Updates with a priority
+        above zero are also sent ahead of bulk traffic on the connection.
         """
         return await self._connection.call(
             'updateScenes',
-            {'scenes': [self._capture_changes()], 'priority': priority}
+            {'scenes': [self._capture_changes()], 'priority': priority},
+            priority=priority > 0
         )
 
     def attach_controls(self, *controls):
@@ -51,8 +105,63 @@ class Scene(Resource):
         :type controls: List[Control]
         """
         for control in controls:
-            self.controls[control.id] = control
-            control._attach_scene(self)
+            self._put_control(control)
+
+    def _put_control(self, control):
+        previous = self.controls.get(control.id)
+        self.controls[control.id] = control
+        control._attach_scene(self)
+        if self._index is not None:
+            self._index.add(control, replacing=previous)
+
+    def tally_votes(self, window=0.5, buckets=10, event='mousedown',
+                    unique=False):
+        """
+        Starts counting input on the scene's controls over a sliding window.
+        See :class:`~interactive_python.VoteTally` for details.
+
+        :param window: the length of the window, in seconds
+        :type window: float
+        :param buckets: the number of parts the window expires in
+        :type buckets: int
+        :param event: the kind of input to count
+        :type event: str
+        :param unique: count each participant once per control per window
+        :type unique: bool
+        :rtype: VoteTally
+        """
+        tally = VoteTally(window=window, buckets=buckets, event=event,
+                          unique=unique)
+        self._tallies.append(tally)
+        return tally
+
+    def stop_tally(self, tally):
+        """
+        Stops counting input into a tally created by :func:`tally_votes`.
+        :type tally: VoteTally
+        """
+        self._tallies.remove(tally)
+
+    def _attach_index(self, index):
+        """
+        Called by the State to have the scene keep its ControlIndex up to
+        date as controls are added and removed.
+        :type index: ControlIndex
+        """
+        self._index = index
+        for control in self.controls.values():
+            index.add(control)
+
+    def _detach_index(self):
+        """
+        Removes the scene's controls from its ControlIndex.
+        """
+        if self._index is None:
+            return
+
+        for control in self.controls.values():
+            self._index.remove(control)
+        self._index = None
 
     async def create_controls(self, *controls):
         """
@@ -67,27 +176,59 @@ class Scene(Resource):
         })
 
     def to_json(self):
-        props = super().to_json()
-        props['controls'] = [c.to_json() for c in self.controls]
+        props = dict(super().to_json())
+        props['controls'] = [c.to_json() for c in self.controls.values()]
         return props
 
+    _diff_ignored = ('etag', 'controls')
+
+    def _snapshot(self):
+        snapshot = super()._snapshot()
+        del snapshot['data']['controls']
+        snapshot['changes'] = [c for c in snapshot['changes']
+                               if c != 'controls']
+        snapshot['controls'] = [c._snapshot() for c in self.controls.values()]
+        return snapshot
+
+    def _restore(self, snapshot):
+        super()._restore(snapshot)
+        self._data['controls'] = {}
+        controls = []
+        for control_snapshot in snapshot['controls']:
+            data = control_snapshot['data']
+            control = self._control_kinds[data['kind']](data['controlID'])
+            control._restore(control_snapshot)
+            controls.append(control)
+
+        self.attach_controls(*controls)
+
     def _on_deleted(self, call):
         super()._on_deleted(call)
-        for control in self.controls:
+        for control in self.controls.values():
             control._on_deleted(call)
 
     def _on_control_delete(self, call):
         for control_id in call.data['controlIDs']:
             if control_id in self.controls:
-                self.controls[control_id]._on_deleted(call)
-                del self.controls[control_id]
+                control = self.controls.pop(control_id)
+                control._on_deleted(call)
+                if self._index is not None:
+                    self._index.remove(control)
+
+    def _apply_changes(self, change, call):
+        change = dict(change)
+        controls = change.pop('controls', ())
+        super()._apply_changes(change, call)
+        self._update_controls(controls, call)
 
     def _on_control_update_or_create(self, call):
-        for update in call.data['controls']:
+        self._update_controls(call.data['controls'], call)
+
+    def _update_controls(self, updates, call):
+        for update in updates:
             if update['controlID'] not in self.controls:
-                c = self._control_kinds[update['kind']](update['controlID'])
-                c._attach_connection(self._connection)
-                self.controls[update['controlID']] = c
+                self._put_control(self._control_kinds[update['kind']](
+                    update['controlID']))
 
             self.controls[update['controlID']]._apply_changes(update, call)
 
@@ -146,7 +287,13 @@ class Control(Resource):
         self._attach_connection(scene._connection)
 
     def _give_input(self, call):
-        self.emit(call.data['input']['event'], call)
+        data = call.data
+        event = data['input']['event']
+        if self._scene is not None and self._scene._tallies:
+            for tally in self._scene._tallies:
+                tally._record(self.id, event, data.get('participantID'))
+
+        self._dispatch(event, call)
 
     async def delete(self):
         """
@@ -178,5 +325,41 @@ class Button(Control):
 class Joystick(Control):
     def __init__(self, control_id, **kwargs):
         super().__init__(control_id)
+        self._aggregators = []
         kwargs['kind'] = 'joystick'
         self.assign(**kwargs)
+
+    def aggregate(self, capacity=1024, ttl=1.0):
+        """
+        Starts keeping the latest position of each participant's stick in a
+        :class:`~interactive_python.JoystickAggregator`.
+
+        :param capacity: the number of participants to allocate room for
+        :type capacity: int
+        :param ttl: seconds after which a stick that hasn't moved is stale
+        :type ttl: float
+        :rtype: JoystickAggregator
+        """
+        aggregator = JoystickAggregator(capacity=capacity, ttl=ttl)
+        self._aggregators.append(aggregator)
+        return aggregator
+
+    def stop_aggregating(self, aggregator):
+        """
+        Stops feeding an aggregator created by :func:`aggregate`.
+        :type aggregator: JoystickAggregator
+        """
+        self._aggregators.remove(aggregator)
+
+    def _give_input(self, call):
+        if self._aggregators:
+            data = call.data
+            stick = data['input']
+            if stick['event'] == 'move':
+                participant_id = data.get('participantID')
+                x = stick.get('x', 0)
+                y = stick.get('y', 0)
+                for aggregator in self._aggregators:
+                    aggregator._record(participant_id, x, y)
+
+        Control._give_input(self, call)
@@ -0,0 +1,162 @@
+import multiprocessing
+import queue
+import time
+import traceback
+import zlib
+
+from .errors import InputHandlerError, ShardWorkerDiedError
+
+
+def _shard_worker(handler, inbox, outbox):
+    """
+    Runs in each worker process, calling the handler on each batch of input
+    it's sent and sending back the results, until it's sent None. Results
+    are sent as (True, result) tuples, and exceptions raised by the handler
+    as (False, InputHandlerError) tuples.
+    """
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            return
+
+        results = []
+        for data in batch:
+            try:
+                result = handler(data)
+            except Exception as e:
+                results.append((False, InputHandlerError(
+                    repr(e), data, traceback.format_exc())))
+                continue
+
+            if result is not None:
+                results.append((True, result))
+
+        if results:
+            outbox.put(results)
+
+
+class InputShards:
+    """
+    InputShards hands the input given by participants off to a pool of
+    worker processes, so that CPU-heavy handling can use more than one core.
+    Create one with :func:`State.shard_input`::
+
+        def score(data):
+            # Runs in a worker process, with the params of a giveInput call.
+            if looks_like_spam(data['input']):
+                return data['participantID']
+
+        state.shard_input(score, workers=4)
+        state.on('inputResult', lambda session_id: mute(session_id))
+
+    Input is sharded by participant ID, so each participant's input is
+    handled by the same worker, in the order it was given. The handler's
+    return values, other than None, are sent back and emitted as
+    ``inputResult`` events on the State during :func:`State.pump`; results
+    for a participant arrive in order, but results from different workers
+    may be interleaved. If the handler raises, the input is skipped and an
+    :class:`~interactive_python.InputHandlerError` is emitted as an
+    ``inputError`` event instead. If a worker process dies, pump() raises a
+    :class:`~interactive_python.ShardWorkerDiedError`.
+
+    Input is batched up and sent to each worker once per call to pump(),
+    rather than one at a time. The handler has to be picklable, which
+    usually means a function defined at the top level of a module.
+    """
+
+    def __init__(self, handler, workers=4, context=None):
+        """
+        :param handler: function called with the params of each giveInput
+        :type handler: Callable[[dict], Any]
+        :param workers: the number of worker processes to start
+        :type workers: int
+        :param context: the multiprocessing start method, such as 'spawn',
+            or None for the platform's default
+        :type context: str
+        """
+        context = multiprocessing.get_context(context)
+        self._outbox = context.Queue()
+        self._inboxes = [context.Queue() for i in range(workers)]
+        self._batches = [[] for i in range(workers)]
+        self._processes = [
+            context.Process(target=_shard_worker,
+                            args=(handler, inbox, self._outbox), daemon=True)
+            for inbox in self._inboxes
+        ]
+        for process in self._processes:
+            process.start()
+
+    def __len__(self):
+        return len(self._processes)
+
+    def _shard(self, participant_id):
+        """
+        Returns the index of the worker which handles the participant's
+        input. Uses crc32 rather than hash(), which is randomized per
+        process, so that shards are stable.
+        :rtype: int
+        """
+        if participant_id is None:
+            return 0
+        return zlib.crc32(participant_id.encode('utf-8')) % len(self._batches)
+
+    def _submit(self, data):
+        """
+        Queues a giveInput call's params to be sent to its worker on the
+        next :func:`_flush`. Called by the State.
+        :type data: dict
+        """
+        self._batches[self._shard(data.get('participantID'))].append(data)
+
+    def _flush(self):
+        """
+        Sends the queued input to the workers, one batch per worker.
+        :raises: ShardWorkerDiedError
+        """
+        for i, batch in enumerate(self._batches):
+            if batch:
+                if not self._processes[i].is_alive():
+                    raise ShardWorkerDiedError(
+                        'Input shard worker {} exited with code {}'.format(
+                            i, self._processes[i].exitcode))
+                self._inboxes[i].put(batch)
+                self._batches[i] = []
+
+    def _drain(self):
+        """
+        Returns the (succeeded, result or error) tuples which the workers
+        have sent back so far, without waiting for any more.
+        :rtype: List[Tuple[bool, Any]]
+        """
+        results = []
+        while True:
+            try:
+                results.extend(self._outbox.get_nowait())
+            except queue.Empty:
+                return results
+
+    def close(self, timeout=5):
+        """
+        Stops the workers once they've handled the input already sent to
+        them, waiting up to ``timeout`` seconds before terminating them.
+        Results which haven't been drained are dropped.
+        :type timeout: float
+        """
+        for i, batch in enumerate(self._batches):
+            if batch and self._processes[i].is_alive():
+                self._inboxes[i].put(batch)
+        for inbox in self._inboxes:
+            inbox.put(None)
+
+        # Results have to be read off the pipe before the workers can exit.
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            while process.is_alive() and time.monotonic() < deadline:
+                self._drain()
+                process.join(0.01)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+
+        for q in self._inboxes + [self._outbox]:
+            q.close()
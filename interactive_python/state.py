@@ -1,13 +1,19 @@
 import collections
 import asyncio
-from pyee import EventEmitter
-
+import json
+import os
+import time
+import zlib
 from .connection import Connection
 from .discovery import Discovery
-from .scene import Scene
+from .errors import CallError
+from .participants import ParticipantRegistry
+from .scene import ControlIndex, Scene
+from .sharding import InputShards
+from ._util import DispatchingEventEmitter
 
 
-class State(EventEmitter):
+class State(DispatchingEventEmitter):
     """State is the state container for a single interactive session.
     It should usually be created via the static
     :func:`~interactive_python.State.connect` method::
@@ -46,9 +52,34 @@ class State(EventEmitter):
             # to dispatch changes manually:
             # for call in pump(): ...
 
+    To keep a steady frame rate through bursts of input, pump() can be given
+    a budget of events and/or seconds per frame. Anything over the budget is
+    left queued for the next call, and ``pending_events`` tells you how much
+    is left::
+
+        while True:
+            my_game_loop.tick()
+            state.pump(max_events=500, max_seconds=0.004)
+            if state.pending_events > 5000:
+                my_game_loop.show_lag_warning()
+
     In both modes, all incoming call are emitted as events on the State
     instance.
 
+    The participants in the session are tracked in ``participants``, a
+    :class:`~interactive_python.ParticipantRegistry`.
+
+    The scenes and controls can be saved to disk, so that a restarted game
+    doesn't have to rebuild and re-create all of them. On restart, load the
+    snapshot and send only what differs from the copy on the server::
+
+        state.save_snapshot('interactive.snapshot')
+
+        # ...after restarting:
+        state = await State.connect(...)
+        state.load_snapshot('interactive.snapshot')
+        await state.sync_with_server()
+
     :param connection: The websocket connection to interactive.
     :type connection: Connection
     """
@@ -56,10 +87,14 @@ class State(EventEmitter):
     def __init__(self, connection):
         super(State, self).__init__()
         self._scenes = {'default': Scene('default')}
+        self._controls = ControlIndex(self._scenes)
+        self.participants = ParticipantRegistry()
+        self._shards = None
         self.connection = connection
         self._enable_event_queue = True
         self._event_queue = collections.deque()
         self._scenes['default']._attach_connection(self.connection)
+        self._scenes['default']._attach_index(self._controls)
 
         self.on('onSceneCreate', self._on_scene_create_or_update)
         self.on('onSceneUpdate', self._on_scene_create_or_update)
@@ -68,6 +103,9 @@ class State(EventEmitter):
         self.on('onControlUpdate', self._on_control_update_or_create)
         self.on('onControlDelete', self._on_control_delete)
         self.on('giveInput', self._give_input)
+        self.on('onParticipantJoin', self.participants._on_join_or_update)
+        self.on('onParticipantUpdate', self.participants._on_join_or_update)
+        self.on('onParticipantLeave', self.participants._on_leave)
 
     def scene(self, name):
         """
@@ -105,7 +143,7 @@ class State(EventEmitter):
 
         return asyncio.ensure_future(run(), loop=loop)
 
-    def pump(self):
+    def pump(self, max_events=None, max_seconds=None):
         """
         pump causes the state to read any updates it has queued up. This
         should usually be called at the start of any game loop where you're
@@ -116,21 +154,88 @@ class State(EventEmitter):
         Alternately, you can call pump_async() to have delivery handled for you
         without manual input.
 
+        :param max_events: stop after dispatching this many events
+        :type max_events: int
+        :param max_seconds: stop once this many seconds have been spent
+            dispatching events. At least one event is always dispatched.
+        :type max_seconds: float
         :rtype: Iterator of Calls
         """
         self._event_queue.clear()
-        while True:
+        if max_seconds is not None:
+            deadline = time.perf_counter() + max_seconds
+
+        dispatched = 0
+        while max_events is None or dispatched < max_events:
             call = self.connection.get_packet()
             if call is None:
-                return
+                break
 
-            self.emit(call.name, call)
+            self._dispatch(call.name, call)
+            dispatched += 1
 
             if self._enable_event_queue:
                 self._event_queue.append(call)
 
+            if max_seconds is not None and time.perf_counter() >= deadline:
+                break
+
+        if self._shards is not None:
+            self._shards._flush()
+            for succeeded, result in self._shards._drain():
+                self._dispatch('inputResult' if succeeded else 'inputError',
+                               result)
+
         return self._event_queue
 
+    def shard_input(self, handler, workers=4, context=None):
+        """
+        Starts handing the params of every giveInput call to a pool of
+        worker processes, sharded by participant, as well as routing them
+        to their controls. Whatever the handler returns, other than None, is
+        emitted as an ``inputResult`` event during pump(), and exceptions it
+        raises as ``inputError`` events. See
+        :class:`~interactive_python.InputShards` for details.
+
+        :param handler: picklable function called with each giveInput's
+            params in a worker process
+        :type handler: Callable[[dict], Any]
+        :param workers: the number of worker processes to start
+        :type workers: int
+        :param context: the multiprocessing start method, or None for the
+            platform's default
+        :type context: str
+        :rtype: InputShards
+        """
+        if self._shards is not None:
+            raise RuntimeError('Input is already being sharded')
+
+        self._shards = InputShards(handler, workers=workers, context=context)
+        return self._shards
+
+    def stop_sharding(self, timeout=5):
+        """
+        Stops the worker processes started by :func:`shard_input`, once
+        they've handled the input already sent to them.
+        :type timeout: float
+        """
+        if self._shards is None:
+            return
+
+        shards, self._shards = self._shards, None
+        shards.close(timeout)
+
+    def _handler_loop(self):
+        return self.connection._loop
+
+    @property
+    def pending_events(self):
+        """
+        The number of events waiting to be pumped.
+        :rtype: int
+        """
+        return self.connection.recv_queue_depth
+
     async def create_scenes(self, *scenes):
         """
         Can be called with one or more Scenes to add them to Interactive.
@@ -139,10 +244,11 @@ class State(EventEmitter):
         """
         for scene in scenes:
             self._scenes[scene.id] = scene
-            scene._attach_connection(self)
+            scene._attach_connection(self.connection)
+            scene._attach_index(self._controls)
 
         return await self.connection.call(
-            'createScenes', [s._resolve_all() for s in scenes])
+            'createScenes', {'scenes': [s.to_json() for s in scenes]})
 
     async def set_ready(self, is_ready=True):
         """
@@ -152,26 +258,272 @@ class State(EventEmitter):
         :param is_ready: True or False to allow input
         :rtype: Reply
         """
-        return await self.connection.call('ready', {'isReady': is_ready})
+        return await self.connection.call('ready', {'isReady': is_ready},
+                                          priority=True)
+
+    def snapshot(self):
+        """
+        Returns a JSON-serializable snapshot of the scenes and their
+        controls, including which of their properties have changed but
+        haven't been sent to Interactive yet. It can be loaded again with
+        :func:`restore`.
+        :rtype: dict
+        """
+        return {
+            'version': 1,
+            'scenes': [s._snapshot() for s in self._scenes.values()],
+        }
+
+    def restore(self, snapshot):
+        """
+        Replaces the scenes and controls with those in a snapshot taken by
+        :func:`snapshot`. Nothing is sent to Interactive; call
+        :func:`sync_with_server` for that.
+        :type snapshot: dict
+        """
+        if snapshot.get('version') != 1:
+            raise ValueError('Unsupported snapshot version {!r}'
+                             .format(snapshot.get('version')))
 
-    def _give_input(self, call):
-        control_id = call.data['input']['controlID']
         for scene in self._scenes.values():
-            if control_id in scene.controls:
-                scene.controls[control_id]._give_input(call)
-                break
+            scene._detach_index()
+        self._scenes.clear()
+
+        for scene_snapshot in snapshot['scenes']:
+            scene = Scene(scene_snapshot['data']['sceneID'])
+            scene._attach_connection(self.connection)
+            scene._restore(scene_snapshot)
+            scene._attach_index(self._controls)
+            self._scenes[scene.id] = scene
+
+    def save_snapshot(self, path):
+        """
+        Writes a :func:`snapshot` to the file, as compressed JSON. The file
+        is replaced atomically, so a crash while saving leaves the previous
+        snapshot intact.
+        :type path: str
+        """
+        data = json.dumps(self.snapshot(), separators=(',', ':'))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(zlib.compress(data.encode('utf-8')))
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path):
+        """
+        Restores the scenes and controls from a file written by
+        :func:`save_snapshot`.
+        :type path: str
+        """
+        with open(path, 'rb') as f:
+            data = zlib.decompress(f.read())
+        self.restore(json.loads(data.decode('utf-8')))
+
+    async def sync_with_server(self):
+        """
+        Brings Interactive and the State into line after :func:`restore`,
+        sending only what differs. Scenes and controls which only exist
+        locally are created, those which differ from the server's copy are
+        updated, and those which only exist on the server are added to the
+        State. Afterwards, every scene and control is marked as synced.
+
+        Returns a dict of the number of scenes and controls ``created`` and
+        ``updated`` on the server, and ``adopted`` from it.
+
+        :rtype: dict
+        """
+        loop = self.connection._loop
+        reply = await self.connection.call('getScenes', {})
+        remote_scenes = {s['sceneID']: s for s in reply.get('scenes', ())}
+        summary = {'created': 0, 'updated': 0, 'adopted': 0}
+        calls = []
+
+        local_only = [s for s in self._scenes.values()
+                      if s.id not in remote_scenes]
+        if local_only:
+            calls.append(self.connection.call(
+                'createScenes', {'scenes': [s.to_json() for s in local_only]}))
+            summary['created'] += len(local_only) + sum(
+                len(s.controls) for s in local_only)
+
+        for scene_id, remote in remote_scenes.items():
+            scene = self._scenes.get(scene_id)
+            if scene is None:
+                scene = Scene(scene_id)
+                scene._attach_connection(self.connection)
+                scene._attach_index(self._controls)
+                self._scenes[scene_id] = scene
+                scene._apply_changes(remote, None)
+                summary['adopted'] += 1 + len(remote.get('controls', ()))
+                continue
+
+            calls.extend(self._sync_scene(scene, remote, summary))
+
+        await asyncio.gather(*calls, loop=loop)
+
+        for scene in self._scenes.values():
+            scene._mark_synced()
+            for control in scene.controls.values():
+                control._mark_synced()
+
+        return summary
+
+    def _sync_scene(self, scene, remote, summary):
+        """
+        Returns the calls which bring a scene which exists both locally and
+        on the server into line, and adopts the server's controls which
+        don't exist locally.
+        """
+        calls = []
+        remote_controls = {c['controlID']: c
+                           for c in remote.get('controls', ())}
+
+        created = [c.to_json() for c in scene.controls.values()
+                   if c.id not in remote_controls]
+        if created:
+            calls.append(self.connection.call(
+                'createControls', {'sceneID': scene.id, 'controls': created}))
+            summary['created'] += len(created)
+
+        updated = []
+        for control_id, data in remote_controls.items():
+            control = scene.controls.get(control_id)
+            if control is None:
+                scene._update_controls([data], None)
+                summary['adopted'] += 1
+                continue
+
+            diff = control._diff(data)
+            if diff is not None:
+                updated.append(diff)
+        if updated:
+            calls.append(self.connection.call(
+                'updateControls', {'sceneID': scene.id, 'controls': updated}))
+            summary['updated'] += len(updated)
+
+        diff = scene._diff(remote)
+        if diff is not None:
+            calls.append(self.connection.call(
+                'updateScenes', {'scenes': [diff]}))
+            summary['updated'] += 1
+
+        return calls
+
+    async def move_participants(self, assignments, max_bytes=32 * 1024,
+                                concurrency=4, timeout=10):
+        """
+        Moves participants into groups, for example to move a whole
+        audience onto a new scene. The moves are sent in as many
+        "updateParticipants" calls as it takes to keep the participants in
+        each under ``max_bytes``, with up to ``concurrency`` of them awaiting
+        replies at once::
+
+            summary = await state.move_participants(
+                {p.session_id: 'red' for p in state.participants})
+            for session_id, error in summary['failed'].items():
+                print('could not move', session_id, error)
+
+        The participants' current etags are taken from ``participants``,
+        which is updated from the replies.
+
+        Returns a dict with the number of participants ``moved``, the number
+        of ``calls`` it took, and a dict of the ``failed`` session IDs to
+        the CallError or asyncio.TimeoutError their call failed with.
+
+        :param assignments: session IDs and the group IDs to move them to
+        :type assignments: Union[Dict[str, str], Iterable[Tuple[str, str]]]
+        :param max_bytes: the most bytes of participants to send per call
+        :type max_bytes: int
+        :param concurrency: the most calls to have awaiting replies at once
+        :type concurrency: int
+        :param timeout: deadline for each call's reply, in seconds
+        :type timeout: float
+        :rtype: dict
+        """
+        if isinstance(assignments, dict):
+            assignments = assignments.items()
+
+        chunks = self._chunk_participants(assignments, max_bytes)
+        summary = {'moved': 0, 'calls': 0, 'failed': {}}
+
+        async def work():
+            for chunk in chunks:
+                summary['calls'] += 1
+                try:
+                    result = await self.connection.call(
+                        'updateParticipants', {'participants': chunk},
+                        timeout=timeout)
+                except (CallError, asyncio.TimeoutError) as e:
+                    for participant in chunk:
+                        summary['failed'][participant['sessionID']] = e
+                    continue
+
+                summary['moved'] += len(chunk)
+                for participant in (result or {}).get('participants', ()):
+                    self.participants._upsert(participant)
+
+        await asyncio.gather(*[work() for i in range(concurrency)],
+                             loop=self.connection._loop)
+        return summary
+
+    def _chunk_participants(self, assignments, max_bytes):
+        """
+        Yields lists of participant updates moving the sessions into their
+        groups, each of which serializes to at most max_bytes (unless a
+        single update is larger than that).
+        """
+        codec = self.connection._codec
+        chunk = []
+        size = 0
+        for session_id, group_id in assignments:
+            update = {'sessionID': session_id, 'groupID': group_id}
+            participant = self.participants.get(session_id)
+            if participant is not None and participant.etag is not None:
+                update['etag'] = participant.etag
+
+            length = len(codec.dumps(update)) + 1
+            if chunk and size + length > max_bytes:
+                yield chunk
+                chunk = []
+                size = 0
+
+            chunk.append(update)
+            size += length
+
+        if chunk:
+            yield chunk
+
+    def _give_input(self, call):
+        data = call.data['input']
+        scene_id = data.get('sceneID')
+        if scene_id is not None:
+            scene = self._scenes.get(scene_id)
+            control = scene.controls.get(data['controlID']) \
+                if scene is not None else None
+        else:
+            control = self._controls.get(data['controlID'])
+
+        if control is not None:
+            control._give_input(call)
+
+        if self._shards is not None:
+            self._shards._submit(call.data)
 
     def _on_scene_delete(self, call):
-        if call.data['sceneID'] not in self._scenes:
+        scene = self._scenes.pop(call.data['sceneID'], None)
+        if scene is None:
             return
 
-        self.scenes[call.data['sceneID']].delete(call)
-        del self.scenes[call.data['sceneID']]
+        scene._detach_index()
+        scene._on_deleted(call)
 
     def _on_scene_create_or_update(self, call):
-        for scene in call.data.scenes:
+        for scene in call.data['scenes']:
             if scene['sceneID'] not in self._scenes:
-                self._scenes[scene['sceneID']] = Scene(self, scene['sceneID'])
+                created = Scene(scene['sceneID'])
+                created._attach_connection(self.connection)
+                created._attach_index(self._controls)
+                self._scenes[scene['sceneID']] = created
 
             self._scenes[scene['sceneID']]._apply_changes(scene, call)
 
@@ -188,7 +540,15 @@ class State(EventEmitter):
     async def connect(discovery=Discovery(), **kwargs):
         """
         Creates a new interactive connection. Most arguments will be passed
-        through into the Connection constructor.
+        through into the Connection constructor. For example, to ask for
+        websocket compression with a small window::
+
+            state = await State.connect(
+                project_version_id=my_version_id,
+                authorization="Bearer " + oauth_token,
+                permessage_deflate={'client_max_window_bits': 11,
+                                    'server_max_window_bits': 11,
+                                    'mem_level': 4})
 
         :param discovery:
         :type discovery: Discovery
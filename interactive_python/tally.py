@@ -0,0 +1,132 @@
+import collections
+import heapq
+import time
+
+
+class VoteTally:
+    """
+    VoteTally counts the input given on a scene's controls over a sliding
+    window of time, so that a game can read which control is winning once
+    per frame rather than handling every click. Create one with
+    :func:`Scene.tally_votes`::
+
+        tally = scene.tally_votes(window=0.5)
+
+        def tick():
+            winner = tally.top(1)
+            if winner:
+                move_in_direction(winner[0][0])
+
+    The window is split into ``buckets`` equal parts kept in a ring, and
+    inputs expire one bucket at a time. Running totals are kept as inputs
+    come in and expire, so reading them doesn't depend on how many inputs
+    there were.
+
+    Only ``event`` inputs (by default, button presses) are counted. If
+    ``unique`` is True, each participant is counted at most once per
+    control within the window.
+    """
+
+    def __init__(self, window=0.5, buckets=10, event='mousedown',
+                 unique=False, clock=time.monotonic):
+        self._width = window / buckets
+        self._size = buckets
+        self._event = event
+        self._unique = unique
+        self._clock = clock
+
+        self._buckets = [collections.Counter() for i in range(buckets)]
+        self._voters = [[] for i in range(buckets)]
+        self._totals = collections.Counter()
+        self._seen = {}
+        self._serial = self._bucket_serial()
+
+    def _bucket_serial(self):
+        return int(self._clock() / self._width)
+
+    def _advance(self):
+        """
+        Expires the buckets which have fallen out of the window.
+        """
+        serial = self._bucket_serial()
+        if serial <= self._serial:
+            return
+
+        if serial - self._serial >= self._size:
+            self.reset()
+            self._serial = serial
+            return
+
+        while self._serial < serial:
+            self._serial += 1
+            index = self._serial % self._size
+            self._totals.subtract(self._buckets[index])
+            self._buckets[index].clear()
+            for key in self._voters[index]:
+                if self._seen.get(key) == self._serial - self._size:
+                    del self._seen[key]
+            self._voters[index].clear()
+
+        self._totals += collections.Counter()  # drops zero counts
+
+    def _record(self, control_id, event, participant_id=None):
+        """
+        Counts an input on the control. Called by the scene.
+        """
+        if event != self._event:
+            return
+
+        self._advance()
+        index = self._serial % self._size
+        if self._unique and participant_id is not None:
+            key = (participant_id, control_id)
+            if key in self._seen:
+                return
+            self._seen[key] = self._serial
+            self._voters[index].append(key)
+
+        self._buckets[index][control_id] += 1
+        self._totals[control_id] += 1
+
+    def total(self, control_id=None):
+        """
+        Returns the number of inputs counted in the window, for the control
+        if given, or across all controls otherwise.
+        :type control_id: str
+        :rtype: int
+        """
+        self._advance()
+        if control_id is not None:
+            return self._totals[control_id]
+
+        return sum(self._totals.values())
+
+    def totals(self):
+        """
+        Returns a dict of control IDs to the number of inputs counted on
+        them in the window.
+        :rtype: Dict[str, int]
+        """
+        self._advance()
+        return dict(self._totals)
+
+    def top(self, n=1):
+        """
+        Returns up to n (control ID, count) pairs for the controls with the
+        most inputs in the window, highest first.
+        :type n: int
+        :rtype: List[Tuple[str, int]]
+        """
+        self._advance()
+        return heapq.nlargest(n, self._totals.items(), key=lambda i: i[1])
+
+    def reset(self):
+        """
+        Forgets all the inputs counted so far.
+        """
+        for bucket in self._buckets:
+            bucket.clear()
+        for voters in self._voters:
+            voters.clear()
+        self._totals.clear()
+        self._seen.clear()
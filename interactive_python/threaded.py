@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+from .connection import Connection
+from .discovery import Discovery
+from .state import State
+
+
+class ThreadedState(State):
+    """
+    ThreadedState is a State whose connection runs on its own event loop,
+    in a background thread, for games with a synchronous game loop. Socket
+    reads and writes carry on while a frame is being rendered, and a slow
+    read doesn't delay the frame. Create one with :func:`start`::
+
+        state = ThreadedState.start(
+            project_version_id=my_version_id,
+            authorization="Bearer " + oauth_token)
+        state.run(state.set_ready()).result()
+
+        while True:
+            state.pump()
+            my_game_loop.tick()
+
+    Calls are handed from the I/O thread to the game thread in the
+    connection's receive queue, a deque, which both threads use without
+    locking: the I/O thread appends calls as they're read, and pump()
+    takes them off the other end. Handlers are only ever called on the
+    thread which calls pump(). pump_async() can't be used.
+
+    Handlers can reply to calls with :func:`~interactive_python.Call.reply`
+    as usual; replies are handed to the I/O thread to be sent. Handlers
+    which are coroutines are run on the I/O thread's loop, and if they
+    raise, the ``error`` event is emitted on that thread.
+
+    Coroutines, such as :func:`State.set_ready` or
+    :func:`~interactive_python.Scene.update`, have to be run on the I/O
+    thread's loop with :func:`run`, which returns a
+    concurrent.futures.Future for the result. They read the resources they
+    update when they start, so avoid changing those resources from the game
+    thread until their future is done.
+    """
+
+    def __init__(self, connection, loop, thread):
+        """
+        Use :func:`start` rather than creating a ThreadedState directly.
+        """
+        super(ThreadedState, self).__init__(connection)
+        self._loop = loop
+        self._thread = thread
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    @classmethod
+    def start(cls, discovery=Discovery(), timeout=30, loop=None, **kwargs):
+        """
+        Starts the I/O thread and connects to Interactive on it, blocking
+        until the connection is established. Other arguments are passed
+        through into the Connection constructor.
+
+        :param discovery:
+        :type discovery: Discovery
+        :param timeout: how long to wait for the connection, in seconds
+        :type timeout: float
+        :param loop: the event loop to run in the I/O thread, or None to
+            create a new one. It must not already be running.
+        :type loop: asyncio.AbstractEventLoop
+        :rtype: ThreadedState
+        """
+        loop = loop or asyncio.new_event_loop()
+        thread = threading.Thread(target=cls._run_loop, args=(loop,),
+                                  name='interactive-io', daemon=True)
+        thread.start()
+
+        async def connect():
+            if 'address' not in kwargs and 'socket' not in kwargs:
+                kwargs['address'] = await discovery.find()
+
+            connection = Connection(loop=loop, **kwargs)
+            await connection.connect()
+            return connection
+
+        try:
+            connection = asyncio.run_coroutine_threadsafe(
+                connect(), loop).result(timeout)
+        except Exception:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            raise
+
+        return cls(connection, loop, thread)
+
+    def run(self, coroutine):
+        """
+        Schedules a coroutine to run on the I/O thread's loop, and returns
+        a future for its result which can be waited on from any thread::
+
+            reply = state.run(state.connection.call('getTime', {}))
+            print(reply.result(timeout=5))
+
+        :rtype: concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _schedule(self, coroutine):
+        asyncio.run_coroutine_threadsafe(coroutine, self._loop) \
+            .add_done_callback(self._report_handler_error)
+
+    def pump_async(self, loop=None):
+        raise RuntimeError('ThreadedState is pumped by calling pump()')
+
+    def stop(self, timeout=10):
+        """
+        Closes the connection, then stops the I/O thread and its loop.
+        Calls which haven't been pumped yet are left in the queue.
+        :type timeout: float
+        """
+        try:
+            self.run(self.connection.close()).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._loop.close()
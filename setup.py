@@ -23,7 +23,11 @@ setup(
     url='https://github.com/mixer/interactive-python',
     license='MIT',
     packages=find_packages(exclude=['tests']),
-    install_requires=['websockets>=3.3', 'varint>=1.0.2', 'pyee>=3.0.3',
-                      'aiohttp>=2.0.7'],
+    install_requires=['websockets>=6.0', 'pyee>=6.0', 'aiohttp>=2.0.7'],
+    extras_require={
+        'orjson': ['orjson>=3.0'],
+        'msgpack': ['msgpack>=0.6'],
+        'numpy': ['numpy>=1.13'],
+    },
     include_package_data=True,
 )
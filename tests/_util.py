@@ -3,8 +3,12 @@ import asyncio
 import os
 import functools
 import json
+from unittest.mock import Mock
 from nose.tools import nottest
 
+from interactive_python import JSONCodec, TextEncoding
+from interactive_python.connection import Call
+
 file_path = os.path.dirname(os.path.realpath(__file__))
 
 
@@ -35,6 +39,24 @@ def resolve(value):
     return future
 
 
+def make_call(method, params):
+    return Call(Mock(), {'type': 'method', 'method': method,
+                         'params': params})
+
+
+class FakeClock:
+    """
+    FakeClock can be passed as the clock of anything which takes one, and
+    returns ``now`` until it's moved on by the test.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
 class AsyncTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -50,3 +72,63 @@ class AsyncTestCase(unittest.TestCase):
         if isinstance(b, str):
             b = json.loads(b)
         self.assertEqual(a, b)
+
+
+class EchoServer:
+    """
+    EchoServer is a stand-in for the Interactive service, which can be passed
+    to the Connection as its socket. It negotiates compression with any of
+    the given encodings and replies to every other method call with its
+    params. Packets are serialized with the negotiated encoding's codec,
+    if it has one. If a ``fail`` function is given, it's called with each
+    method packet, and can return an error to reply with instead.
+    """
+
+    def __init__(self, loop, encodings=(), fail=None):
+        self._encoding = TextEncoding()
+        self._encodings = {e.name(): e for e in encodings}
+        self._fail = fail or (lambda packet: None)
+        self._outbox = asyncio.Queue(loop=loop)
+        self.received = []
+        self._push({'type': 'method', 'method': 'hello', 'params': {}})
+
+    def _codec(self):
+        return self._encoding.codec() or JSONCodec()
+
+    def _push(self, packet):
+        data = self._codec().dumps(packet)
+        if self._encoding.name() != 'text':
+            data = self._encoding.encode(data)
+        self._outbox.put_nowait(data)
+
+    async def send(self, data):
+        if isinstance(data, str):
+            packets = json.loads(data)
+        else:
+            packets = self._codec().loads(self._encoding.decode_bytes(data))
+
+        if not isinstance(packets, list):
+            packets = [packets]
+
+        for packet in packets:
+            self.received.append(packet)
+            if packet['type'] != 'method':
+                continue
+            if packet['method'] == 'setCompression':
+                scheme = next((s for s in packet['params']['scheme']
+                               if s in self._encodings), 'text')
+                self._push({'type': 'reply', 'id': packet['id'],
+                            'result': {'scheme': scheme}})
+                self._encoding = self._encodings.get(scheme, TextEncoding())
+            elif self._fail(packet) is not None:
+                self._push({'type': 'reply', 'id': packet['id'],
+                            'error': self._fail(packet)})
+            elif not packet.get('discard'):
+                self._push({'type': 'reply', 'id': packet['id'],
+                            'result': packet['params']})
+
+    async def recv(self):
+        return await self._outbox.get()
+
+    async def close(self):
+        pass
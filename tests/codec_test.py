@@ -0,0 +1,78 @@
+import unittest
+from interactive_python import JSONCodec, OrjsonCodec, MessagePackCodec, \
+    Button
+from interactive_python.codec import orjson, msgpack
+from ._util import fixture
+
+samples = 3
+
+
+class CodecTests:
+    def test_round_trip(self):
+        for i in range(samples):
+            sample = fixture('sample{}_decoded'.format(i))
+            parsed = JSONCodec().loads(sample)
+            self.assertEqual(parsed,
+                             self.codec.loads(self.codec.dumps(parsed)))
+
+    def test_parses_bytes(self):
+        sample = fixture('sample0_decoded')
+        self.assertEqual(self.codec.loads(sample),
+                         self.codec.loads(sample.encode('utf-8')))
+
+    def test_serializes_resources(self):
+        button = Button('click_me', text='Click Me!')
+        self.assertEqual(
+            {'controls': [{'controlID': 'click_me', 'meta': {},
+                           'kind': 'button', 'text': 'Click Me!'}]},
+            self.codec.loads(self.codec.dumps({'controls': [button]})))
+
+    def test_joins_arrays(self):
+        packets = [{'id': i} for i in range(20)]
+        first = self.codec.join([self.codec.dumps(p) for p in packets[:3]], 3)
+        rest = self.codec.join([self.codec.dumps(p) for p in packets[3:]], 17)
+        joined = self.codec.join([self.codec.unwrap(first, 3),
+                                  self.codec.unwrap(rest, 17)], 20)
+        self.assertEqual(packets, self.codec.loads(joined))
+
+    def test_raises_on_unknown_objects(self):
+        with self.assertRaises(TypeError):
+            self.codec.dumps({'foo': object()})
+
+
+class JSONCodecTests(CodecTests):
+    def test_serializes_non_string_keys(self):
+        self.assertEqual('{"1":"a"}', self.codec.dumps({1: 'a'}))
+
+    def test_serializes_large_integers(self):
+        self.assertEqual('{"n":1180591620717411303424}',
+                         self.codec.dumps({'n': 2 ** 70}))
+
+
+class TestJSONCodec(JSONCodecTests, unittest.TestCase):
+    def setUp(self):
+        self.codec = JSONCodec()
+
+    def test_raises_on_nan(self):
+        with self.assertRaises(ValueError):
+            self.codec.dumps({'n': float('nan')})
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class TestOrjsonCodec(JSONCodecTests, unittest.TestCase):
+    def setUp(self):
+        self.codec = OrjsonCodec()
+
+    def test_serializes_nan_as_null(self):
+        self.assertEqual('{"n":null}', self.codec.dumps({'n': float('nan')}))
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class TestMessagePackCodec(CodecTests, unittest.TestCase):
+    def setUp(self):
+        self.codec = MessagePackCodec()
+
+    def test_parses_bytes(self):
+        packed = self.codec.dumps({'foo': 'bar'})
+        self.assertIsInstance(packed, bytes)
+        self.assertEqual({'foo': 'bar'}, self.codec.loads(memoryview(packed)))
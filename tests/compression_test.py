@@ -0,0 +1,64 @@
+import asyncio
+from interactive_python import CompressionController, TextEncoding, \
+    GzipEncoding
+from ._util import AsyncTestCase, fixture
+
+
+class FakeConnection:
+    def __init__(self, loop, encoding):
+        self._loop = loop
+        self._encoding = encoding
+        self.schemes = []
+
+    async def set_compression(self, scheme):
+        self.schemes.append(scheme.name())
+        self._encoding = scheme
+        return True
+
+
+class TestCompressionController(AsyncTestCase):
+
+    def setUp(self):
+        super(TestCompressionController, self).setUp()
+        self._now = 0
+        self._controller = CompressionController(
+            window=1, patience=2, sample_every=1, clock=lambda: self._now)
+
+    def _run_windows(self, windows, frame, encoded_length, seconds=0):
+        for i in range(windows):
+            for j in range(10):
+                self._controller.record(frame, encoded_length, seconds)
+            self._now += 1
+            self._controller.record(frame, encoded_length, seconds)
+            self._loop.run_until_complete(asyncio.sleep(0, loop=self._loop))
+
+    def _attach(self, encoding):
+        connection = FakeConnection(self._loop, encoding)
+        self._controller.attach(connection)
+        return connection
+
+    def test_upgrades_large_compressible_traffic(self):
+        connection = self._attach(TextEncoding())
+        frame = fixture('sample0_decoded') * 10
+        self._run_windows(1, frame, len(frame))
+        self.assertEqual([], connection.schemes)
+        self._run_windows(1, frame, len(frame))
+        self.assertEqual(['gzip'], connection.schemes)
+
+    def test_keeps_text_for_small_frames(self):
+        connection = self._attach(TextEncoding())
+        frame = '{"type":"reply","id":1,"result":null}'
+        self._run_windows(5, frame, len(frame))
+        self.assertEqual([], connection.schemes)
+
+    def test_downgrades_cpu_bound_traffic(self):
+        connection = self._attach(GzipEncoding())
+        frame = fixture('sample0_decoded') * 10
+        self._run_windows(3, frame, len(frame) // 5, seconds=0.01)
+        self.assertEqual(['text'], connection.schemes)
+
+    def test_does_not_flap_within_the_hysteresis_band(self):
+        connection = self._attach(GzipEncoding())
+        frame = 'x' * 220  # under min_frame_size, but within the hysteresis
+        self._run_windows(5, frame, 50)
+        self.assertEqual([], connection.schemes)
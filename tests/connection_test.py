@@ -1,9 +1,16 @@
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 import asyncio
+import unittest
 import websockets
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-from interactive_python import Connection, GzipEncoding
-from ._util import AsyncTestCase, async_test, resolve, fixture
+from interactive_python import Connection, GzipEncoding, CallError, \
+    SendQueueFullError, PresetDictionaryEncoding, MessagePackEncoding, \
+    WriterDiedError
+from interactive_python.codec import msgpack
+from ._util import AsyncTestCase, async_test, resolve, fixture, EchoServer
 
 
 sample_method = '{"id":0,"type":"method","method":"some_method",' \
@@ -95,6 +102,7 @@ class TestInteractiveConnection(AsyncTestCase):
         yield from self._queue.put('{"id":0,"type":"reply",'
                                    '"result":{"scheme":"text"},"seq":2}')
         yield from asyncio.sleep(0, loop=self._loop)
+        yield from self._connection.flush()
 
         self.assertEqual('text', self._connection._encoding.name())
         self.assertJsonEqual(
@@ -126,3 +134,378 @@ class TestInteractiveConnection(AsyncTestCase):
         self.assertTrue(has_packet)  # reads what we pushed to get unblocked
         has_packet = yield from self._connection.has_packet()
         self.assertFalse(has_packet)  # gets a connection closed
+
+    @async_test
+    def test_batches_packets_sent_in_the_same_tick(self):
+        self._connection._batch = True
+        yield from self._connection.connect()
+        yield from self._connection.call('foo', 1, discard=True)
+        yield from self._connection.call('bar', 2, discard=True)
+        self.assertEqual(0, self._mock_socket.send.call_count)
+        yield from asyncio.sleep(0, loop=self._loop)
+
+        self.assertEqual(1, self._mock_socket.send.call_count)
+        self.assertJsonEqual(
+            self._mock_socket.send.call_args[0][0],
+            [{'type': 'method', 'method': 'foo', 'params': 1, 'id': 0,
+              'seq': 0, 'discard': True},
+             {'type': 'method', 'method': 'bar', 'params': 2, 'id': 1,
+              'seq': 0, 'discard': True}]
+        )
+        self.assertEqual(
+            {'frames': 1, 'packets': 2, 'packets_per_frame': {2: 1},
+             'dropped': 0},
+            self._connection.batch_stats)
+
+    @async_test
+    def test_splits_batches_over_the_byte_limit(self):
+        self._connection._batch = True
+        self._connection._batch_max_bytes = 250
+        yield from self._connection.connect()
+        for i in range(3):
+            yield from self._connection.call('foo', 'x' * 30, discard=True)
+        yield from asyncio.sleep(0, loop=self._loop)
+
+        self.assertEqual(2, self._mock_socket.send.call_count)
+        self.assertEqual({1: 1, 2: 1},
+                         self._connection.batch_stats['packets_per_frame'])
+
+    def _stall_socket(self):
+        self._mock_socket.send.return_value = asyncio.Future(loop=self._loop)
+
+    @async_test
+    def test_drops_discardable_packets_on_overflow(self):
+        self._connection._send_queue_size = 2
+        self._connection._send_overflow = 'drop'
+        self._stall_socket()
+        yield from self._connection.connect()
+        yield from self._connection.call('a', 1, discard=True)
+        yield from asyncio.sleep(0, loop=self._loop)
+        self.assertGreater(self._connection.bytes_in_flight, 0)
+
+        for method in ('b', 'c', 'd'):
+            yield from self._connection.call(method, 1, discard=True)
+
+        self.assertEqual(2, self._connection.send_queue_depth)
+        self.assertEqual(1, self._connection.batch_stats['dropped'])
+        self.assertEqual(['c', 'd'], [json.loads(entry[0])['method'] for entry
+                                      in self._connection._send_queue])
+
+    @async_test
+    def test_closes_stalled_sockets_after_the_timeout(self):
+        self._stall_socket()
+        closed = asyncio.Future(loop=self._loop)
+        closed.set_result(None)
+        self._mock_socket.close = Mock(return_value=closed)
+        yield from self._connection.connect()
+        yield from self._connection.call('a', 1, discard=True)
+        yield from self._connection.call('b', 1, discard=True)
+        yield from asyncio.sleep(0, loop=self._loop)
+
+        yield from asyncio.wait_for(self._connection.close(timeout=0.05),
+                                    1, loop=self._loop)
+        yield from asyncio.sleep(0, loop=self._loop)
+        self._mock_socket.close.assert_called_once_with()
+        self.assertTrue(self._connection._send_task.done())
+        self.assertEqual(1, self._connection.send_queue_depth)
+
+    @async_test
+    def test_raises_on_overflow(self):
+        self._connection._send_queue_size = 1
+        self._connection._send_overflow = 'raise'
+        yield from self._connection.connect()
+        yield from self._connection.call('a', 1, discard=True)
+        with self.assertRaises(SendQueueFullError):
+            yield from self._connection.call('b', 1, discard=True)
+
+    @async_test
+    def test_blocks_on_overflow(self):
+        self._connection._send_queue_size = 1
+        yield from self._connection.connect()
+        yield from self._connection.call('a', 1, discard=True)
+        yield from self._connection.call('b', 1, discard=True)
+        yield from self._connection.flush()
+        self.assertEqual(0, self._connection.send_queue_depth)
+        self.assertEqual(2, self._mock_socket.send.call_count)
+
+    @async_test
+    def test_calls_many_methods_in_one_frame(self):
+        yield from self._connection.connect()
+        results = yield from asyncio.gather(
+            self._connection.call_many([('square', 2), ('square', 3),
+                                        ('square', 'x')], timeout=0.1),
+            self._queue.put('[{"id":1,"type":"reply","result":9,"seq":2},'
+                            '{"id":0,"type":"reply","result":4,"seq":2}]'),
+            loop=self._loop)
+
+        self.assertEqual(1, self._mock_socket.send.call_count)
+        self.assertJsonEqual(
+            self._mock_socket.send.call_args[0][0],
+            [{'type': 'method', 'method': 'square', 'params': 2, 'id': 0,
+              'seq': 0},
+             {'type': 'method', 'method': 'square', 'params': 3, 'id': 1,
+              'seq': 0},
+             {'type': 'method', 'method': 'square', 'params': 'x', 'id': 2,
+              'seq': 0}]
+        )
+        self.assertEqual([4, 9], results[0][:2])
+        self.assertIsInstance(results[0][2], asyncio.TimeoutError)
+        self.assertEqual({}, self._connection._awaiting_replies)
+
+    @async_test
+    def test_rejects_calls_with_error_replies(self):
+        yield from self._connection.connect()
+        with self.assertRaises(CallError) as context:
+            yield from asyncio.gather(
+                self._connection.call('square', 'x'),
+                self._queue.put('{"id":0,"type":"reply","result":null,'
+                                '"error":{"code":4000,"message":"nope"}}'),
+                loop=self._loop)
+
+        self.assertEqual(4000, context.exception.error['code'])
+
+    @async_test
+    def test_expires_calls_sharing_a_deadline(self):
+        yield from self._connection.connect()
+        calls = [asyncio.ensure_future(
+                     self._connection.call('a', 1, timeout=t), loop=self._loop)
+                 for t in (0.05, 0.01, None)]
+        yield from asyncio.sleep(0.1, loop=self._loop)
+
+        self.assertIsInstance(calls[0].exception(), asyncio.TimeoutError)
+        self.assertIsInstance(calls[1].exception(), asyncio.TimeoutError)
+        self.assertFalse(calls[2].done())
+        self.assertEqual([2], list(self._connection._awaiting_replies))
+        self.assertEqual([], self._connection._reply_deadlines)
+        calls[2].cancel()
+
+    @async_test
+    def test_ignores_methods(self):
+        self._connection.ignore('onParticipantUpdate')
+        yield from self._connection.connect()
+        self._queue.put_nowait('{"type":"method","method":'
+                               '"onParticipantUpdate","params":{},"seq":2}')
+        self._queue.put_nowait('[{"type":"method","method":'
+                               '"onParticipantUpdate","params":{}},'
+                               + sample_method + ']')
+        has_packet = yield from self._connection.has_packet()
+        self.assertTrue(has_packet)
+        self.assertEqual('some_method', self._connection.get_packet().name)
+        self.assertIsNone(self._connection.get_packet())
+        self.assertEqual(2, self._connection.packets_ignored)
+        self.assertEqual(2, self._connection._last_sequence_number)
+
+    @async_test
+    def test_lazily_parses_calls(self):
+        self._connection._lazy_calls = True
+        yield from self._connection.connect()
+        self._queue.put_nowait(sample_method)
+        yield from self._connection.has_packet()
+        call = self._connection.get_packet()
+
+        self.assertEqual('some_method', call.name)
+        self.assertEqual(0, call.id)
+        self.assertIsNone(call._payload)
+        self.assertEqual({'foo': 42}, call.data)
+
+    @async_test
+    def test_fails_calls_once_the_writer_dies(self):
+        self._connection._send_queue_size = 1
+        self._connection._send_overflow = 'block'
+        self._mock_socket.send.side_effect = RuntimeError('oops')
+        yield from self._connection.connect()
+
+        with self.assertLogs('interactive_python', 'ERROR'):
+            with self.assertRaises(WriterDiedError) as raised:
+                yield from self._connection.call('square', 2, timeout=None)
+        self.assertIsInstance(raised.exception.__cause__, RuntimeError)
+        self.assertEqual(0, len(self._connection._awaiting_replies))
+
+        # With the queue full, a call would block until the writer drained
+        # it, which a dead writer never will.
+        self._connection._send_queue.append((b'', 1, False))
+        with self.assertRaises(WriterDiedError):
+            yield from self._connection.call('square', 3)
+        with self.assertRaises(WriterDiedError):
+            self._connection.reply(0, result=9)
+
+    @async_test
+    def test_records_metrics(self):
+        yield from self._connection.connect()
+        yield from asyncio.gather(
+            self._connection.call('square', 2),
+            self._queue.put('{"id":0,"type":"reply","result":4,"seq":2}'),
+            loop=self._loop)
+        with self.assertRaises(asyncio.TimeoutError):
+            yield from self._connection.call('square', 3, timeout=0.01)
+
+        metrics = self._connection.metrics_snapshot()
+        self.assertEqual(2, metrics['methods']['square']['calls'])
+        self.assertEqual(1, metrics['methods']['square']['timeouts'])
+        self.assertEqual(1, metrics['methods']['square']['latency']['count'])
+        self.assertEqual(2, metrics['frames_in'])
+        self.assertEqual(2, metrics['frames_out'])
+        self.assertEqual(metrics['bytes_out'], metrics['bytes_out_decoded'])
+        self.assertEqual(0, metrics['awaiting_replies'])
+
+    @async_test
+    def test_keeps_reporting_metrics_after_a_callback_raises(self):
+        snapshots = []
+
+        def callback(snapshot):
+            snapshots.append(snapshot)
+            raise ValueError('oops')
+
+        self._connection._metrics_callback = callback
+        self._connection._metrics_interval = 0.01
+        yield from self._connection.connect()
+        with self.assertLogs('interactive_python', 'ERROR'):
+            yield from asyncio.sleep(0.05, loop=self._loop)
+        self._connection._metrics_timer.cancel()
+
+        self.assertGreater(len(snapshots), 1)
+
+    def _sent_methods(self):
+        return [json.loads(args[0]).get('method', 'reply')
+                for args, _ in self._mock_socket.send.call_args_list]
+
+    @async_test
+    def test_sends_priority_packets_first(self):
+        self._stall_socket()
+        yield from self._connection.connect()
+        yield from self._connection.call('a', 1, discard=True)
+        yield from asyncio.sleep(0, loop=self._loop)
+        yield from self._connection.call('b', 1, discard=True)
+        yield from self._connection.call('c', 1, discard=True)
+        self._connection.reply(5, result=1)
+
+        self._mock_socket.send.return_value.set_result(None)
+        yield from self._connection.flush()
+        self.assertEqual(['a', 'reply', 'b', 'c'], self._sent_methods())
+
+    @async_test
+    def test_weights_priority_packets(self):
+        self._connection._send_policy = 'weighted'
+        self._connection._priority_weight = 1
+        self._stall_socket()
+        yield from self._connection.connect()
+        yield from self._connection.call('a', 1, discard=True)
+        yield from asyncio.sleep(0, loop=self._loop)
+        for method in ('b', 'c'):
+            yield from self._connection.call(method, 1, discard=True)
+        for method in ('p1', 'p2'):
+            yield from self._connection.call(method, 1, discard=True,
+                                             priority=True)
+
+        self._mock_socket.send.return_value.set_result(None)
+        yield from self._connection.flush()
+        self.assertEqual(['a', 'p1', 'b', 'p2', 'c'], self._sent_methods())
+
+
+class TestTransportCompression(unittest.TestCase):
+
+    def _connect_kwargs(self, **kwargs):
+        with patch('websockets.client.connect') as connect:
+            Connection(address='ws://example.com', loop=Mock(), **kwargs)
+
+        return connect.call_args[1]
+
+    def test_uses_library_defaults(self):
+        kwargs = self._connect_kwargs()
+        self.assertNotIn('compression', kwargs)
+        self.assertNotIn('extensions', kwargs)
+
+    def test_disables_permessage_deflate(self):
+        kwargs = self._connect_kwargs(permessage_deflate=False)
+        self.assertIsNone(kwargs['compression'])
+
+    def test_configures_permessage_deflate(self):
+        kwargs = self._connect_kwargs(permessage_deflate={
+            'client_max_window_bits': 11,
+            'server_max_window_bits': 10,
+            'mem_level': 4,
+        })
+        factory, = kwargs['extensions']
+        self.assertEqual('permessage-deflate', factory.name)
+        self.assertEqual(11, factory.client_max_window_bits)
+        self.assertEqual(10, factory.server_max_window_bits)
+        self.assertEqual({'memLevel': 4}, factory.compress_settings)
+
+    def test_rejects_unknown_settings(self):
+        with self.assertRaises(ValueError):
+            self._connect_kwargs(permessage_deflate={'window_bits': 11})
+
+
+class TestEchoServerConnection(AsyncTestCase):
+
+    def setUp(self):
+        super(TestEchoServerConnection, self).setUp()
+        encodings = [GzipEncoding(), PresetDictionaryEncoding()]
+        if msgpack is not None:
+            encodings.append(MessagePackEncoding())
+        self._server = EchoServer(self._loop, encodings)
+        self._connection = Connection(socket=self._server, loop=self._loop)
+
+    def tearDown(self):
+        self._loop.run_until_complete(self._connection.close())
+        super(TestEchoServerConnection, self).tearDown()
+
+    @async_test
+    def test_negotiates_preset_dictionary_encoding(self):
+        yield from self._connection.connect()
+        upgraded = yield from self._connection.set_compression(
+            PresetDictionaryEncoding())
+        self.assertTrue(upgraded)
+        self.assertEqual('deflate-dict', self._connection._encoding.name())
+
+        result = yield from self._connection.call('echo', {'foo': 42})
+        self.assertEqual({'foo': 42}, result)
+        self.assertEqual('echo', self._server.received[-1]['method'])
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    @async_test
+    def test_negotiates_message_pack_encoding(self):
+        self._connection._batch = True
+        yield from self._connection.connect()
+        upgraded = yield from self._connection.set_compression(
+            MessagePackEncoding())
+        self.assertTrue(upgraded)
+
+        result = yield from self._connection.call('echo', {'foo': [1, 2]})
+        self.assertEqual({'foo': [1, 2]}, result)
+        results = yield from self._connection.call_many(
+            [('echo', {'n': i}) for i in range(20)])
+        self.assertEqual([{'n': i} for i in range(20)], results)
+        self.assertEqual({'n': 19}, self._server.received[-1]['params'])
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    @async_test
+    def test_reserializes_queued_packets_when_switching_codecs(self):
+        yield from self._connection.connect()
+        self._connection._send({'foo': 1})
+        self._connection._send_many([{'foo': 2}, {'foo': 3}])
+        self._connection._use_encoding(MessagePackEncoding())
+        self.assertEqual(
+            [msgpack.packb({'foo': 1}),
+             msgpack.packb([{'foo': 2}, {'foo': 3}])],
+            [entry[0] for entry in self._connection._send_queue])
+        self.assertEqual(
+            sum(len(entry[0]) for entry in self._connection._send_queue),
+            self._connection.send_queue_bytes)
+
+    @async_test
+    def test_offloads_large_frames_to_the_executor(self):
+        executor = ThreadPoolExecutor(1)
+        self._connection._executor = executor
+        self._connection._offload_threshold = 1000
+        yield from self._connection.connect()
+        yield from self._connection.set_compression(GzipEncoding())
+
+        small = yield from self._connection.call('echo', 'small')
+        payload = os.urandom(1000).hex()
+        large = yield from self._connection.call('echo', payload)
+        self.assertEqual('small', small)
+        self.assertEqual(payload, large)
+        self.assertEqual(
+            2, self._connection.metrics_snapshot()['frames_offloaded'])
+        executor.shutdown()
@@ -1,5 +1,10 @@
 import unittest
-from interactive_python import GzipEncoding
+import zlib
+from interactive_python import GzipEncoding, PresetDictionaryEncoding, \
+    MessagePackEncoding, JSONCodec, build_dictionary
+from interactive_python.codec import msgpack
+from interactive_python.encoding import encode_varint, decode_varint, \
+    EncodingException
 from ._util import fixture
 
 samples = 3
@@ -23,3 +28,74 @@ class TestGzipEncoding(unittest.TestCase):
                 fixture('sample{}_encoded'.format(i), 'rb'))
             self.assertEqual(py_decoded, go_decoded)
 
+    def test_round_trips_large_messages(self):
+        encoder = GzipEncoding()
+        decoder = GzipEncoding()
+        for i in range(5):
+            sample = fixture('sample0_decoded') * (100 * i + 1)
+            self.assertEqual(sample, decoder.decode(encoder.encode(sample)))
+
+
+class TestPresetDictionaryEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        encoder = PresetDictionaryEncoding()
+        decoder = PresetDictionaryEncoding()
+        for i in range(samples):
+            sample = fixture('sample{}_decoded'.format(i))
+            self.assertEqual(sample, decoder.decode(encoder.encode(sample)))
+
+    def test_beats_gzip_on_small_frames(self):
+        for i in range(samples):
+            sample = fixture('sample{}_decoded'.format(i))
+            self.assertLess(len(PresetDictionaryEncoding().encode(sample)),
+                            len(GzipEncoding().encode(sample)))
+
+    def test_requires_the_same_dictionary(self):
+        encoded = PresetDictionaryEncoding().encode(fixture('sample0_decoded'))
+        with self.assertRaises(zlib.error):
+            PresetDictionaryEncoding(dictionary=b'nope').decode(encoded)
+
+    def test_builds_dictionaries_from_common_fragments(self):
+        frames = ['{{"method":"giveInput","params":{{"participantID":"{}"}}}}'
+                  .format(i) for i in range(10)]
+        dictionary = build_dictionary(frames)
+        self.assertTrue(dictionary.endswith(b'"method":"giveInput"'))
+        self.assertIn(b'"participantID":', dictionary)
+        self.assertNotIn(b'"participantID":"1"', dictionary)
+        self.assertLessEqual(len(build_dictionary(frames, size=30)), 30)
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class TestMessagePackEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        encoding = MessagePackEncoding()
+        codec = encoding.codec()
+        for i in range(samples):
+            packet = JSONCodec().loads(fixture('sample{}_decoded'.format(i)))
+            encoded = encoding.encode(codec.dumps(packet))
+            self.assertEqual(packet, codec.loads(encoding.decode(encoded)))
+
+    def test_is_smaller_than_json(self):
+        codec = MessagePackEncoding().codec()
+        for i in range(samples):
+            sample = fixture('sample{}_decoded'.format(i))
+            self.assertLess(len(codec.dumps(JSONCodec().loads(sample))),
+                            len(sample.encode('utf-8')))
+
+    def test_text_encodings_have_no_codec(self):
+        self.assertIsNone(GzipEncoding().codec())
+
+
+class TestVarint(unittest.TestCase):
+    def test_round_trip(self):
+        for value in (0, 1, 127, 128, 300, 16384, 2 ** 32):
+            encoded = encode_varint(value)
+            self.assertEqual((value, len(encoded)),
+                             decode_varint(encoded + b'trailing'))
+
+    def test_encodes_little_endian_groups(self):
+        self.assertEqual(b'\xac\x02', encode_varint(300))
+
+    def test_raises_on_unterminated_varints(self):
+        with self.assertRaises(EncodingException):
+            decode_varint(b'\xac\x82')
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+
+from interactive_python import Joystick, Scene, JoystickAggregator
+from interactive_python.joystick import numpy
+from ._util import FakeClock, make_call
+
+
+class AggregatorTests:
+
+    def setUp(self):
+        self._clock = FakeClock()
+        self._sticks = JoystickAggregator(capacity=2, ttl=1,
+                                          clock=self._clock)
+
+    def test_starts_empty(self):
+        self.assertEqual(0, self._sticks.count())
+        self.assertIsNone(self._sticks.mean())
+        self.assertIsNone(self._sticks.weighted_mean())
+        self.assertEqual([0] * 4, self._sticks.histogram(bins=4))
+
+    def test_averages_the_latest_positions(self):
+        self._sticks._record('a', 1, 1)
+        self._sticks._record('a', 1, 0)
+        self._sticks._record('b', 0, 1)
+        self._sticks._record('c', -1, 0.5)
+        self.assertEqual(3, self._sticks.count())
+        self.assertEqual((0, 0.5), self._sticks.mean())
+
+        self._sticks.set_weight('a', 2)
+        self._sticks.set_weight('c', 0)
+        self.assertEqual((2 / 3, 1 / 3), self._sticks.weighted_mean())
+
+    def test_counts_directions(self):
+        for i, (x, y) in enumerate([(1, 0), (0.9, 0.1), (0, 1), (-1, 0),
+                                    (0, -1), (0.01, 0.01)]):
+            self._sticks._record(i, x, y)
+        self.assertEqual([2, 1, 1, 1], self._sticks.histogram(bins=4))
+
+    def test_leaves_out_stale_sticks(self):
+        self._sticks._record('a', 1, 0)
+        self._clock.now += 0.6
+        self._sticks._record('b', -1, 0)
+        self._clock.now += 0.6
+        self.assertEqual(1, self._sticks.count())
+        self.assertEqual((-1, 0), self._sticks.mean())
+
+    def test_reuses_stale_slots(self):
+        self._sticks._record('a', 1, 0)
+        self._sticks._record('b', 1, 0)
+        self._clock.now += 2
+        self._sticks._record('c', 1, 0)
+        self.assertEqual(1, len(self._sticks))
+        self.assertEqual(2, len(self._sticks._x))
+
+    def test_grows_when_full(self):
+        for i in range(3):
+            self._sticks._record(i, i, 0)
+        self.assertEqual(4, len(self._sticks._x))
+        self.assertEqual((1, 0), self._sticks.mean())
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestNumpyAggregator(AggregatorTests, unittest.TestCase):
+    pass
+
+
+class TestPythonAggregator(AggregatorTests, unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('interactive_python.joystick.numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+class TestJoystickAggregation(unittest.TestCase):
+
+    def test_aggregates_moves(self):
+        joystick = Joystick('stick')
+        Scene('default').attach_controls(joystick)
+        sticks = joystick.aggregate()
+        moves = []
+        joystick.on('move', moves.append)
+
+        call = make_call('giveInput', {
+            'participantID': 'a',
+            'input': {'controlID': 'stick', 'event': 'move',
+                      'x': 0.5, 'y': -0.5},
+        })
+        joystick._give_input(call)
+        self.assertEqual((0.5, -0.5), sticks.mean())
+        self.assertEqual([call], moves)
+
+        joystick.stop_aggregating(sticks)
+        self.assertEqual([], joystick._aggregators)
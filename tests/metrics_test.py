@@ -0,0 +1,26 @@
+import unittest
+from interactive_python.metrics import LatencyHistogram
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_reports_nothing_when_empty(self):
+        self.assertEqual(
+            {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'p99': None},
+            LatencyHistogram().snapshot())
+
+    def test_computes_percentiles(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.record(i / 1000)
+
+        self.assertEqual(100, histogram.count)
+        self.assertAlmostEqual(0.0505, histogram.snapshot()['mean'])
+        for p in (50, 95, 99):
+            # percentiles are bucketed, so only accurate to within ~20%
+            self.assertGreaterEqual(histogram.percentile(p), p / 1000)
+            self.assertLess(histogram.percentile(p), p / 1000 * 1.2)
+
+    def test_clamps_large_durations(self):
+        histogram = LatencyHistogram()
+        histogram.record(10000)
+        self.assertEqual(LatencyHistogram.bounds[-1], histogram.percentile(50))
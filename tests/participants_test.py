@@ -0,0 +1,150 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import Mock
+
+from interactive_python import State, ParticipantRegistry, Connection, \
+    CallError
+from ._util import AsyncTestCase, EchoServer, async_test, make_call
+
+
+def participants_call(method, *participants):
+    return make_call(method, {'participants': list(participants)})
+
+
+def participant(session_id, user_id, group_id='default', **kwargs):
+    return dict(sessionID=session_id, userID=user_id, groupID=group_id,
+                username='user{}'.format(user_id), level=1, etag='a',
+                lastInputAt=0, connectedAt=0, disabled=False, **kwargs)
+
+
+class TestParticipantRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self._state = State(Mock())
+        self._participants = self._state.participants
+        self._state.emit('onParticipantJoin', participants_call(
+            'onParticipantJoin',
+            participant('s1', 1),
+            participant('s2', 2, 'red'),
+            participant('s3', 3, 'red')))
+
+    def test_indexes_joined_participants(self):
+        self.assertEqual(3, len(self._participants))
+        self.assertIn('s1', self._participants)
+        self.assertEqual('user2', self._participants.get('s2').username)
+        self.assertIs(self._participants.get('s3'),
+                      self._participants.by_user(3))
+        self.assertEqual(['s2', 's3'], [p.session_id for p in
+                                        self._participants.in_group('red')])
+        self.assertEqual(1, self._participants.group_size('default'))
+
+    def test_moves_updated_participants_between_groups(self):
+        self._state.emit('onParticipantUpdate', participants_call(
+            'onParticipantUpdate', {'sessionID': 's1', 'groupID': 'red',
+                                    'etag': 'b'}))
+        record = self._participants.get('s1')
+        self.assertEqual('red', record.group_id)
+        self.assertEqual('b', record.etag)
+        self.assertEqual('user1', record.username)
+        self.assertEqual(3, self._participants.group_size('red'))
+        self.assertEqual(['red'], self._participants.groups())
+
+    def test_removes_participants_who_leave(self):
+        self._state.emit('onParticipantLeave', participants_call(
+            'onParticipantLeave', {'sessionID': 's2'}, {'sessionID': 'nope'}))
+        self.assertIsNone(self._participants.get('s2'))
+        self.assertIsNone(self._participants.by_user(2))
+        self.assertEqual(1, self._participants.group_size('red'))
+
+    def test_keeps_the_newest_session_for_a_user(self):
+        self._participants._upsert(participant('s4', 1))
+        self._participants._remove({'sessionID': 's1'})
+        self.assertEqual('s4', self._participants.by_user(1).session_id)
+
+    def test_serializes_participants(self):
+        self.assertEqual(participant('s2', 2, 'red'),
+                         self._participants.get('s2').to_json())
+
+    def test_interns_group_ids(self):
+        registry = ParticipantRegistry()
+        registry._upsert(participant('a', 1, ''.join(['bl', 'ue'])))
+        registry._upsert(participant('b', 2, ''.join(['bl', 'ue'])))
+        self.assertIs(registry.get('a').group_id, registry.get('b').group_id)
+
+
+class TestMoveParticipants(AsyncTestCase):
+
+    def setUp(self):
+        super(TestMoveParticipants, self).setUp()
+        self._server = EchoServer(self._loop, fail=self._fail)
+        self._state = State(Connection(socket=self._server, loop=self._loop))
+        self._state.participants._upsert(participant('s1', 1))
+
+    def tearDown(self):
+        self._loop.run_until_complete(self._state.connection.close())
+        super(TestMoveParticipants, self).tearDown()
+
+    def _fail(self, packet):
+        if packet['method'] != 'updateParticipants':
+            return None
+        if any(p['sessionID'] == 'bad' for p in packet['params']
+               ['participants']):
+            return {'code': 4017, 'message': 'nope'}
+
+    def _updates(self):
+        return [packet['params']['participants']
+                for packet in self._server.received
+                if packet['method'] == 'updateParticipants']
+
+    @async_test
+    def test_moves_participants_in_chunks(self):
+        yield from self._state.connection.connect()
+        assignments = [('s{}'.format(i), 'red') for i in range(1, 201)]
+        summary = yield from self._state.move_participants(
+            assignments, max_bytes=1000)
+
+        updates = self._updates()
+        self.assertEqual({'moved': 200, 'calls': len(updates), 'failed': {}},
+                         summary)
+        self.assertGreater(len(updates), 1)
+        for chunk in updates:
+            self.assertLessEqual(len(json.dumps(chunk, separators=(',', ':'))),
+                                 1000)
+        self.assertEqual(assignments, [(p['sessionID'], p['groupID'])
+                                       for chunk in updates for p in chunk])
+        self.assertEqual({'sessionID': 's1', 'groupID': 'red', 'etag': 'a'},
+                         updates[0][0])
+        self.assertEqual(200, self._state.participants.group_size('red'))
+
+    @async_test
+    def test_limits_calls_in_flight(self):
+        yield from self._state.connection.connect()
+        call = self._state.connection.call
+        in_flight = [0, 0]
+
+        @asyncio.coroutine
+        def counting_call(*args, **kwargs):
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+            try:
+                return (yield from call(*args, **kwargs))
+            finally:
+                in_flight[0] -= 1
+
+        self._state.connection.call = counting_call
+        yield from self._state.move_participants(
+            [('s{}'.format(i), 'red') for i in range(100)],
+            max_bytes=200, concurrency=3)
+        self.assertEqual(3, in_flight[1])
+
+    @async_test
+    def test_reports_failed_participants(self):
+        yield from self._state.connection.connect()
+        summary = yield from self._state.move_participants(
+            [('s1', 'red'), ('bad', 'red'), ('s3', 'red')], max_bytes=1)
+
+        self.assertEqual(2, summary['moved'])
+        self.assertEqual(['bad'], list(summary['failed']))
+        self.assertIsInstance(summary['failed']['bad'], CallError)
+        self.assertEqual(4017, summary['failed']['bad'].error['code'])
@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from interactive_python import Connection, FrameRecorder, ReplaySocket, \
+    State, read_recording
+from ._util import AsyncTestCase, EchoServer, async_test
+
+
+def method(name, **params):
+    return json.dumps({'type': 'method', 'method': name, 'params': params})
+
+
+def give_input(n):
+    return method('giveInput', participantID='participant',
+                  input={'controlID': 'button', 'event': 'mousedown', 'n': n})
+
+
+class TestFrameRecorder(unittest.TestCase):
+
+    def test_round_trips_frames_and_times(self):
+        now = [100.0]
+        log = io.BytesIO()
+        recorder = FrameRecorder(log, clock=lambda: now[0])
+        recorder.write('{"hello":"world"}')
+        now[0] += 0.25
+        recorder.write(b'\x00\x01binary')
+        now[0] += 1.5
+        recorder.write('☃')
+
+        log.seek(0)
+        self.assertEqual([
+            (0, '{"hello":"world"}'),
+            (0.25, b'\x00\x01binary'),
+            (1.75, '☃'),
+        ], read_recording(log))
+
+    def test_appends_to_existing_recordings(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'session.iprec')
+            for frame in ('a', 'b'):
+                recorder = FrameRecorder(path)
+                recorder.write(frame)
+                recorder.close()
+
+            self.assertEqual(['a', 'b'],
+                             [f for _, f in read_recording(path)])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_drops_frames_cut_off_mid_write(self):
+        log = io.BytesIO()
+        recorder = FrameRecorder(log)
+        recorder.write('complete')
+        recorder.write('cut off')
+
+        for cut in range(1, len('cut off') + 3):
+            truncated = io.BytesIO(log.getvalue()[:-cut])
+            self.assertEqual(['complete'],
+                             [f for _, f in read_recording(truncated)])
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            read_recording(io.BytesIO(b'{"not": "a recording"}'))
+
+
+class TestRecordAndReplay(AsyncTestCase):
+
+    @async_test
+    def test_records_received_frames(self):
+        log = io.BytesIO()
+        server = EchoServer(self._loop)
+        connection = Connection(socket=server, loop=self._loop,
+                                record=FrameRecorder(log))
+        yield from connection.connect()
+        yield from connection.call('echo', {'n': 1})
+        yield from connection.close()
+
+        log.seek(0)
+        frames = [json.loads(f) for _, f in read_recording(log)]
+        self.assertEqual('hello', frames[0]['method'])
+        self.assertEqual({'n': 1}, frames[1]['result'])
+
+    def _replay(self, frames, speed):
+        socket = ReplaySocket(frames, speed=speed, loop=self._loop)
+        state = State(Connection(socket=socket, loop=self._loop))
+        received = []
+        state.on('giveInput', received.append)
+        return socket, state, received
+
+    @async_test
+    def test_replays_as_fast_as_possible(self):
+        frames = [(0, method('hello'))] + [
+            (i, give_input(i)) for i in range(100)]
+        socket, state, received = self._replay(frames, None)
+
+        yield from state.connection.connect()
+        self.assertEqual(101, (yield from socket.finished))
+        state.pump()
+        yield from state.connection.close()
+
+        self.assertEqual(list(range(100)),
+                         [c.data['input']['n'] for c in received])
+
+    @async_test
+    def test_replays_in_real_time(self):
+        frames = [(0, method('hello')), (0.05, give_input(1)),
+                  (0.1, give_input(2))]
+        socket, state, received = self._replay(frames, 1)
+
+        started = self._loop.time()
+        yield from state.connection.connect()
+        yield from socket.finished
+        self.assertGreaterEqual(self._loop.time() - started, 0.09)
+        state.pump()
+        yield from state.connection.close()
+
+        self.assertEqual(2, len(received))
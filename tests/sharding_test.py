@@ -0,0 +1,113 @@
+import os
+import time
+import unittest
+from unittest.mock import Mock
+
+from interactive_python import State, InputShards, Connection, \
+    InputHandlerError, ShardWorkerDiedError
+from .state_test import give_input
+
+
+def echo(data):
+    return data['participantID'], data['input']['n']
+
+
+def odd_only(data):
+    if data['input']['n'] % 2:
+        return data['input']['n']
+
+
+def fail_on_three(data):
+    if data['input']['n'] == 3:
+        raise ValueError('three')
+    return data['input']['n']
+
+
+def exit_on_three(data):
+    if data['input']['n'] == 3:
+        os._exit(1)
+
+
+def participant_input(participant_id, n):
+    call = give_input('button', n=n)
+    call.data['participantID'] = participant_id
+    return call
+
+
+class TestInputShards(unittest.TestCase):
+
+    def setUp(self):
+        self._state = State(Connection(socket=Mock(), loop=Mock()))
+        self._results = []
+        self._state.on('inputResult', self._results.append)
+
+    def tearDown(self):
+        self._state.stop_sharding()
+
+    def _pump_until(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while len(self._results) < count and time.monotonic() < deadline:
+            self._state.pump()
+            time.sleep(0.01)
+
+    def test_shards_by_participant(self):
+        shards = InputShards(echo, workers=4)
+        try:
+            shard = shards._shard('participant')
+            self.assertEqual(shard, shards._shard('participant'))
+            self.assertEqual(4, len(set(shards._shard('p{}'.format(i))
+                                        for i in range(100))))
+        finally:
+            shards.close()
+
+    def test_keeps_each_participants_order(self):
+        self._state.shard_input(echo, workers=3)
+        for n in range(50):
+            for participant_id in ('a', 'b', 'c', 'd'):
+                self._state.emit('giveInput',
+                                 participant_input(participant_id, n))
+        self._pump_until(200)
+
+        self.assertEqual(200, len(self._results))
+        for participant_id in ('a', 'b', 'c', 'd'):
+            self.assertEqual(list(range(50)), [
+                n for p, n in self._results if p == participant_id])
+
+    def test_drops_none_results(self):
+        self._state.shard_input(odd_only, workers=2)
+        for n in range(10):
+            self._state.emit('giveInput', participant_input('a', n))
+        self._pump_until(5)
+        self._state.stop_sharding()
+        self._state.pump()
+
+        self.assertEqual([1, 3, 5, 7, 9], self._results)
+
+    def test_refuses_to_shard_twice(self):
+        self._state.shard_input(echo, workers=1)
+        with self.assertRaises(RuntimeError):
+            self._state.shard_input(echo, workers=1)
+
+    def test_emits_handler_errors(self):
+        errors = []
+        self._state.on('inputError', errors.append)
+        self._state.shard_input(fail_on_three, workers=2)
+        for n in range(6):
+            self._state.emit('giveInput', participant_input('a', n))
+        self._pump_until(5)
+
+        self.assertEqual([0, 1, 2, 4, 5], self._results)
+        self.assertEqual(1, len(errors))
+        self.assertIsInstance(errors[0], InputHandlerError)
+        self.assertEqual(3, errors[0].data['input']['n'])
+        self.assertIn("ValueError: three", errors[0].traceback)
+
+    def test_raises_when_a_worker_dies(self):
+        self._state.shard_input(exit_on_three, workers=1)
+        self._state.emit('giveInput', participant_input('a', 3))
+        self._state.pump()
+        self._state._shards._processes[0].join(5)
+
+        self._state.emit('giveInput', participant_input('a', 4))
+        with self.assertRaises(ShardWorkerDiedError):
+            self._state.pump()
@@ -0,0 +1,308 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+from interactive_python import State, Scene, Button, Joystick, Connection, \
+    JSONCodec
+from ._util import AsyncTestCase, async_test, make_call
+
+
+def give_input(control_id, **extra):
+    return make_call('giveInput', {
+        'participantID': 'participant',
+        'input': dict(controlID=control_id, event='mousedown', **extra),
+    })
+
+
+class TestStateInputRouting(unittest.TestCase):
+
+    def setUp(self):
+        self._state = State(Mock())
+        self._red = Scene('red')
+        self._state._scenes['red'] = self._red
+        self._red._attach_index(self._state._controls)
+
+    def _listen(self, control):
+        received = []
+        control.on('mousedown', received.append)
+        return received
+
+    def test_routes_input_to_controls_in_any_scene(self):
+        button = Button('red_button')
+        self._red.attach_controls(button)
+        received = self._listen(button)
+
+        call = give_input('red_button')
+        self._state.emit('giveInput', call)
+        self.assertEqual([call], received)
+
+    def test_routes_input_by_scene_when_given(self):
+        default_button = Button('button')
+        red_button = Button('button')
+        self._state.scene('default').attach_controls(default_button)
+        self._red.attach_controls(red_button)
+        default_received = self._listen(default_button)
+        red_received = self._listen(red_button)
+
+        self._state.emit('giveInput', give_input('button', sceneID='red'))
+        self._state.emit('giveInput', give_input('button'))
+        self.assertEqual(1, len(red_received))
+        self.assertEqual(1, len(default_received))
+
+    def test_ignores_input_for_unknown_controls(self):
+        self._state.emit('giveInput', give_input('nope'))
+        self._state.emit('giveInput', give_input('nope', sceneID='blue'))
+
+    def test_indexes_controls_created_by_the_service(self):
+        self._state.emit('onControlCreate', make_call('onControlCreate', {
+            'sceneID': 'red',
+            'controls': [{'controlID': 'stick', 'kind': 'joystick'}],
+        }))
+        control = self._state._controls.get('stick')
+        self.assertIsInstance(control, Joystick)
+        self.assertIs(self._red, control._scene)
+
+    def test_routes_input_to_controls_which_replace_indexed_ones(self):
+        self._state.emit('onControlCreate', make_call('onControlCreate', {
+            'sceneID': 'red',
+            'controls': [{'controlID': 'red_button', 'kind': 'button'}],
+        }))
+        button = Button('red_button')
+        self._red.attach_controls(button)
+        received = self._listen(button)
+
+        self._state.emit('giveInput', give_input('red_button'))
+        self.assertEqual(1, len(received))
+        self.assertIs(button, self._state._controls.get('red_button'))
+
+    def test_falls_back_to_other_scenes_when_controls_are_deleted(self):
+        default_button = Button('button')
+        red_button = Button('button')
+        self._state.scene('default').attach_controls(default_button)
+        self._red.attach_controls(red_button)
+
+        self._state.emit('onControlDelete', make_call('onControlDelete', {
+            'sceneID': 'default',
+            'controlIDs': ['button'],
+        }))
+        self.assertIs(red_button, self._state._controls.get('button'))
+
+    def test_removes_controls_of_deleted_scenes(self):
+        self._red.attach_controls(Button('red_button'))
+        self._state.emit('onSceneDelete', make_call('onSceneDelete', {
+            'sceneID': 'red',
+            'reassignSceneID': 'default',
+        }))
+        self.assertIsNone(self._state.scene('red'))
+        self.assertIsNone(self._state._controls.get('red_button'))
+
+    def test_indexes_controls_of_created_scenes(self):
+        self._state.emit('onSceneCreate', make_call('onSceneCreate', {
+            'scenes': [{
+                'sceneID': 'blue',
+                'controls': [{'controlID': 'blue_button', 'kind': 'button'}],
+            }],
+        }))
+        self.assertIs(self._state.scene('blue').controls['blue_button'],
+                      self._state._controls.get('blue_button'))
+
+
+class TestStateDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self._state = State(Mock())
+        self._state.connection.get_packet.side_effect = self._packets = []
+
+    def _pump(self, *calls):
+        self._packets.extend(calls + (None,))
+        self._state.pump()
+
+    def test_dispatches_to_handlers_added_after_pumping(self):
+        received = []
+        self._pump(make_call('hello', {}))
+        self._state.on('hello', received.append)
+        self._pump(make_call('hello', {}))
+        self.assertEqual(1, len(received))
+
+    def test_dispatches_to_once_handlers_once(self):
+        received = []
+        self._state.once('hello', received.append)
+        self._pump(make_call('hello', {}), make_call('hello', {}))
+        self._pump(make_call('hello', {}))
+        self.assertEqual(1, len(received))
+
+    def test_stops_dispatching_to_removed_handlers(self):
+        received = []
+        self._state.on('hello', received.append)
+        self._pump(make_call('hello', {}))
+        self._state.remove_listener('hello', received.append)
+        self._pump(make_call('hello', {}))
+        self._state.on('hello', received.append)
+        self._state.remove_all_listeners('hello')
+        self._pump(make_call('hello', {}))
+        self.assertEqual(1, len(received))
+
+
+
+class TestStateCoroutineHandlers(AsyncTestCase):
+
+    def setUp(self):
+        super(TestStateCoroutineHandlers, self).setUp()
+        self._connection = Connection(socket=Mock(), loop=self._loop)
+        self._state = State(self._connection)
+        self._received = []
+        self._errors = []
+
+    async def _handle(self, call):
+        self._received.append(call)
+        raise ValueError('oops')
+
+    def _pump(self, *calls):
+        self._connection._recv_queue.extend(calls)
+        self._state.pump()
+        self._loop.run_until_complete(asyncio.sleep(0.01, loop=self._loop))
+
+    def test_schedules_coroutine_handlers_on_the_connections_loop(self):
+        self._state.on('hello', self._handle)
+        self._state.on('error', self._errors.append)
+        self._pump(make_call('hello', {}))
+
+        self.assertEqual(1, len(self._received))
+        self.assertIsInstance(self._errors[0], ValueError)
+
+    def test_schedules_coroutine_handlers_of_controls(self):
+        button = Button('button')
+        self._state.scene('default').attach_controls(button)
+        button.on('mousedown', self._handle)
+        button.on('error', self._errors.append)
+        self._pump(give_input('button'))
+
+        self.assertEqual(1, len(self._received))
+        self.assertIsInstance(self._errors[0], ValueError)
+
+
+class TestStatePumpBudget(unittest.TestCase):
+
+    def setUp(self):
+        self._connection = Connection(socket=Mock(), loop=Mock())
+        self._state = State(self._connection)
+        self._received = []
+        self._state.on('hello', self._received.append)
+        self._connection._recv_queue.extend(
+            make_call('hello', {'n': i}) for i in range(10))
+
+    def test_drains_the_queue_without_a_budget(self):
+        self.assertEqual(10, len(self._state.pump()))
+        self.assertEqual(0, self._state.pending_events)
+
+    def test_stops_after_max_events(self):
+        self.assertEqual(4, len(self._state.pump(max_events=4)))
+        self.assertEqual(6, self._state.pending_events)
+        self._state.pump(max_events=4)
+        self._state.pump(max_events=4)
+        self.assertEqual(list(range(10)),
+                         [call.data['n'] for call in self._received])
+
+    def test_stops_after_max_seconds(self):
+        self._state.on('hello', lambda call: time.sleep(0.01))
+        self.assertEqual(1, len(self._state.pump(max_seconds=0)))
+        self.assertEqual(9, self._state.pending_events)
+        self._state.pump(max_seconds=0.025)
+        self.assertLess(self._state.pending_events, 9)
+        self.assertGreater(self._state.pending_events, 0)
+
+
+class RecordingConnection:
+    """Connection which records calls, and replies to getScenes."""
+
+    def __init__(self, loop, scenes):
+        self._loop = loop
+        self._scenes = scenes
+        self.calls = []
+
+    @asyncio.coroutine
+    def call(self, method, params, **kwargs):
+        if method == 'getScenes':
+            return {'scenes': self._scenes}
+        self.calls.append((method, params))
+        return params
+
+
+class TestStateSnapshot(AsyncTestCase):
+
+    def setUp(self):
+        super(TestStateSnapshot, self).setUp()
+        self._dir = tempfile.mkdtemp()
+        self._state = State(Mock())
+        red = Scene('red')
+        red.meta.color = 'red'
+        red.attach_controls(Button('fire', text='Fire!', cost=10),
+                            Joystick('steer'))
+        self._state._scenes['red'] = red
+        red._attach_index(self._state._controls)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+        super(TestStateSnapshot, self).tearDown()
+
+    def _restored(self, connection):
+        path = os.path.join(self._dir, 'snapshot')
+        self._state.save_snapshot(path)
+        state = State(connection)
+        state.load_snapshot(path)
+        return state
+
+    def test_round_trips_scenes_and_controls(self):
+        self._state.scene('red').controls['fire']._mark_synced()
+        state = self._restored(Mock())
+
+        red = state.scene('red')
+        self.assertEqual(['default', 'red'], sorted(state._scenes))
+        codec = JSONCodec()
+        self.assertEqual(
+            codec.loads(codec.dumps(self._state.scene('red').to_json())),
+            codec.loads(codec.dumps(red.to_json())))
+        self.assertEqual('red', red.meta.color)
+        self.assertIsInstance(red.controls['steer'], Joystick)
+        self.assertIs(red, red.controls['fire']._scene)
+        self.assertIs(red.controls['fire'], state._controls.get('fire'))
+
+        self.assertFalse(red.controls['fire'].has_changed())
+        self.assertTrue(red.controls['steer'].has_changed())
+        self.assertTrue(red.meta.has_changed())
+
+    def test_rejects_unknown_versions(self):
+        with self.assertRaises(ValueError):
+            self._state.restore({'version': 2, 'scenes': []})
+
+    @async_test
+    def test_syncs_only_the_differences(self):
+        connection = RecordingConnection(self._loop, [
+            {'sceneID': 'default', 'controls': [], 'etag': '1'},
+            {'sceneID': 'red', 'meta': {'color': 'red'}, 'etag': '2',
+             'controls': [
+                 {'controlID': 'fire', 'kind': 'button', 'text': 'Fire!',
+                  'cost': 5, 'meta': {}, 'etag': '3'},
+                 {'controlID': 'jump', 'kind': 'button', 'etag': '4'},
+             ]},
+            {'sceneID': 'blue', 'controls': [], 'etag': '5'},
+        ])
+        state = self._restored(connection)
+        summary = yield from state.sync_with_server()
+
+        self.assertEqual({'created': 1, 'updated': 1, 'adopted': 2}, summary)
+        self.assertEqual([
+            ('createControls', {'sceneID': 'red', 'controls': [
+                {'controlID': 'steer', 'kind': 'joystick', 'meta': {}}]}),
+            ('updateControls', {'sceneID': 'red', 'controls': [
+                {'controlID': 'fire', 'cost': 10, 'etag': '3'}]}),
+        ], [(method, JSONCodec().loads(JSONCodec().dumps(params)))
+            for method, params in connection.calls])
+        self.assertEqual(['blue', 'default', 'red'], sorted(state._scenes))
+        self.assertIsInstance(state.scene('red').controls['jump'], Button)
+        self.assertFalse(state.scene('red').controls['steer'].has_changed())
+        self.assertFalse(state.scene('red').meta.has_changed())
@@ -0,0 +1,74 @@
+import unittest
+
+from interactive_python import Scene, Button, VoteTally
+from ._util import FakeClock, make_call
+
+
+class TestVoteTally(unittest.TestCase):
+
+    def setUp(self):
+        self._clock = FakeClock()
+        self._tally = VoteTally(window=1, buckets=4, clock=self._clock)
+
+    def _vote(self, control_id, participant_id=None, event='mousedown'):
+        self._tally._record(control_id, event, participant_id)
+
+    def test_counts_votes_in_the_window(self):
+        for control_id in ('up', 'up', 'down', 'up', 'left', 'down'):
+            self._vote(control_id)
+        self._vote('up', event='mouseup')
+
+        self.assertEqual(6, self._tally.total())
+        self.assertEqual(3, self._tally.total('up'))
+        self.assertEqual({'up': 3, 'down': 2, 'left': 1},
+                         self._tally.totals())
+        self.assertEqual([('up', 3), ('down', 2)], self._tally.top(2))
+
+    def test_expires_votes_a_bucket_at_a_time(self):
+        self._vote('up')
+        self._clock.now += 0.5
+        self._vote('down')
+        self._clock.now += 0.5
+        self.assertEqual({'down': 1}, self._tally.totals())
+        self._clock.now += 0.5
+        self.assertEqual({}, self._tally.totals())
+        self.assertEqual([], self._tally.top(1))
+
+    def test_resets_after_long_gaps(self):
+        self._vote('up')
+        self._clock.now += 60
+        self._vote('down')
+        self.assertEqual({'down': 1}, self._tally.totals())
+
+    def test_counts_participants_once_per_window(self):
+        tally = self._tally = VoteTally(window=1, buckets=4, unique=True,
+                                        clock=self._clock)
+        self._vote('up', 'a')
+        self._vote('up', 'a')
+        self._vote('down', 'a')
+        self._vote('up', 'b')
+        self.assertEqual({'up': 2, 'down': 1}, tally.totals())
+
+        self._clock.now += 1
+        self._vote('up', 'a')
+        self.assertEqual({'up': 1}, tally.totals())
+
+
+class TestSceneTally(unittest.TestCase):
+
+    def test_tallies_input_on_the_scene(self):
+        scene = Scene('default')
+        up, down = Button('up'), Button('down')
+        scene.attach_controls(up, down)
+        tally = scene.tally_votes(unique=True)
+
+        for control, participant in ((up, 'a'), (up, 'b'), (down, 'a'),
+                                     (up, 'a')):
+            control._give_input(make_call('giveInput', {
+                'participantID': participant,
+                'input': {'controlID': control.id, 'event': 'mousedown'},
+            }))
+
+        self.assertEqual([('up', 2)], tally.top(1))
+        scene.stop_tally(tally)
+        self.assertEqual([], scene._tallies)
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from interactive_python import ThreadedState
+from ._util import EchoServer
+
+
+class TestThreadedState(unittest.TestCase):
+
+    def setUp(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = EchoServer(self._loop)
+        self._state = ThreadedState.start(socket=self._server,
+                                          loop=self._loop)
+
+    def tearDown(self):
+        self._state.stop()
+        self._loop.close()
+
+    def _push(self, packet):
+        self._loop.call_soon_threadsafe(self._server._push, packet)
+
+    def _pump_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            self._state.pump()
+            time.sleep(0.001)
+
+    def test_runs_the_connection_on_another_thread(self):
+        self.assertTrue(self._state._thread.is_alive())
+        self.assertIsNot(threading.current_thread(), self._state._thread)
+
+    def test_dispatches_calls_on_the_pumping_thread(self):
+        threads = []
+        self._state.on('hello', lambda call: threads.append(
+            (threading.current_thread(), call.data['n'])))
+        for n in range(100):
+            self._push({'type': 'method', 'method': 'hello',
+                        'params': {'n': n}})
+
+        self._pump_until(lambda: len(threads) == 100)
+        self.assertEqual([(threading.current_thread(), n)
+                          for n in range(100)], threads)
+
+    def test_sends_replies_from_handlers(self):
+        self._state.on('ping', lambda call: call.reply({'pong': True}))
+        self._push({'type': 'method', 'method': 'ping', 'id': 7,
+                    'params': {}})
+
+        self._pump_until(lambda: any(
+            packet.get('id') == 7 for packet in self._server.received))
+        self.assertIn({'type': 'reply', 'id': 7, 'result': {'pong': True}},
+                      self._server.received)
+
+    def test_runs_coroutine_handlers_on_the_io_thread(self):
+        threads = []
+        errors = []
+
+        async def handle(call):
+            threads.append(threading.current_thread())
+            raise ValueError('oops')
+
+        self._state.on('ping', handle)
+        self._state.on('error', errors.append)
+        self._push({'type': 'method', 'method': 'ping', 'params': {}})
+
+        self._pump_until(lambda: len(errors) == 1)
+        self.assertEqual([self._state._thread], threads)
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_runs_calls_from_the_game_thread(self):
+        future = self._state.run(
+            self._state.connection.call('echo', {'foo': 'bar'}))
+        self.assertEqual({'foo': 'bar'}, future.result(5))
+        self.assertEqual('echo', self._server.received[-1]['method'])
+
+    def test_refuses_to_pump_async(self):
+        with self.assertRaises(RuntimeError):
+            self._state.pump_async()